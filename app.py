@@ -3,6 +3,8 @@ import pandas as pd
 import requests
 import plotly.express as px
 
+from src.database.columnar import columnar_to_dataframe
+
 API_URL = "https://querymate-production.up.railway.app"
 
 st.set_page_config(page_title="QueryMate", layout="wide")
@@ -56,12 +58,22 @@ if user_input:
 
                 answer = result.get("reply", "Here are your results.")
                 sql_query = result.get("sql_query")
-                columns = result.get("columns")
-                rows = result.get("sample_rows") 
+                sample_data = result.get("sample_data")
                 viz_code = result.get("viz_code")
 
 
-                df = pd.DataFrame(rows, columns=columns) if columns and rows else None
+                # columnar payload: one list per column, no row-by-row rebuild
+                df = columnar_to_dataframe(sample_data) if sample_data and sample_data.get("row_count") else None
+
+                # JSON turns dates into strings and Decimals into floats; restore from column metadata
+                if df is not None:
+                    for col in result.get("column_meta") or []:
+                        if col["name"] not in df.columns:
+                            continue
+                        if col["type"] in ("date", "timestamp", "timestamptz"):
+                            df[col["name"]] = pd.to_datetime(df[col["name"]], errors="coerce")
+                        elif col["category"] == "numeric":
+                            df[col["name"]] = pd.to_numeric(df[col["name"]], errors="coerce")
                 fig = None
 
                 if viz_code and df is not None:
@@ -0,0 +1,176 @@
+'''
+Benchmark: N concurrent /chat graph runs, sync nodes vs async nodes.
+
+Each run goes orchestrator -> sql_generator -> db_execute -> viz_planner ->
+viz_generator -> orchestrator (4 LLM calls), exactly like graph.ainvoke() in
+POST /chat. The LLM is a fake chat model that sleeps --latency seconds per
+call (time.sleep for invoke, asyncio.sleep for ainvoke), so no API key is needed
+and the numbers isolate how well the requests overlap.
+
+- sequential: one request after the other (the no-overlap baseline)
+- sync:       concurrent, plain sync nodes (langgraph runs them in the default
+              thread pool, so overlap is capped by its max_workers)
+- async:      concurrent, the a*_node variants (awaited on the event loop)
+
+"overlap" = sequential wall time / concurrent wall time (N means perfect).
+"loop lag" is the worst delay of a 10 ms ticker running alongside the requests.
+
+Runs offline against the embedded SQLite Northwind by default:
+    python scripts/benchmark_concurrency.py [requests] [--latency 0.2] [--db sqlite:///data/northwind.db]
+'''
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, List, Optional
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+os.environ.setdefault("SEMANTIC_CACHE", "0")  # every request must reach the LLM
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")  # module-level clients need one; never called
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from src.agent import controller, sql_generator_agent
+from src.agent.prompts import NLQ_TO_SQL_PROMPT, VISUALIZATION_PLANNER_PROMPT
+from src.app_graph import nodes, workflow
+from src.config import DATABASE_URL
+from src.database.db_tool import DBToolConfig, SupabaseDBToolAsync
+from src.database.local_backend import LOCAL_NORTHWIND_URL
+
+SQL = 'SELECT "Country", COUNT(*) AS customers FROM customers GROUP BY "Country" ORDER BY customers DESC'
+
+
+class SlowChatModel(BaseChatModel):
+    latency: float = 0.2
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def _reply(self, messages: List[BaseMessage]) -> ChatResult:
+        system = messages[0].content
+        if system.startswith(NLQ_TO_SQL_PROMPT[:80]):
+            text = SQL
+        elif system == VISUALIZATION_PLANNER_PROMPT:
+            text = "chart: bar\nx: Country\ny: customers"
+        elif "Plotly" in system:
+            text = "import plotly.express as px\nfig = px.bar(df, x='Country', y='customers')"
+        else:
+            text = "[TRIGGER_SQL]"
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._reply(messages)
+
+
+def install_fake_llm(latency: float) -> None:
+    fake = SlowChatModel(latency=latency)
+    controller.llm = fake
+    sql_generator_agent.llm = fake
+    nodes._viz_llm = lambda: fake
+
+
+def initial_state(i: int) -> dict:
+    return {
+        "messages": [HumanMessage(content=f"How many customers per country? (request {i})")],
+        "repair_count": 0,
+        "max_repairs": 3,
+        "next_step": "",
+        "db_result": None,
+        "viz_code": None,
+        "viz_plan": None,
+        "columns": [],
+        "column_meta": [],
+        "sample_rows": [],
+        "needs_clarification": False,
+        "is_unsupported": False,
+        "feedback_reason": None,
+        "last_error": None,
+    }
+
+
+async def _ticker(stop: asyncio.Event, lags: List[float]) -> None:
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - t0 - 0.01)
+
+
+async def run(graph, n: int, concurrent: bool) -> dict:
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(_ticker(stop, lags))
+
+    async def one(i: int) -> bool:
+        config = {"configurable": {"thread_id": f"bench_{concurrent}_{i}"}, "recursion_limit": 40}
+        result = await graph.ainvoke(initial_state(i), config=config)
+        return bool((result.get("db_result") or {}).get("ok")) and bool(result.get("viz_code"))
+
+    t0 = time.perf_counter()
+    if concurrent:
+        ok = await asyncio.gather(*(one(i) for i in range(n)))
+    else:
+        ok = [await one(i) for i in range(n)]
+    wall = time.perf_counter() - t0
+
+    stop.set()
+    await ticker
+    return {"wall": wall, "ok": sum(ok), "lag": max(lags) if lags else 0.0}
+
+
+def build_graph(db_tool, async_nodes: bool):
+    if async_nodes:
+        return workflow.build_querymate_workflow(db_tool)
+    original = workflow._node
+    workflow._node = lambda func, afunc=None: original(func)  # sync func only: runs in the thread pool
+    try:
+        return workflow.build_querymate_workflow(db_tool)
+    finally:
+        workflow._node = original
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("requests", type=int, nargs="?", default=64)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake LLM call")
+    parser.add_argument("--db", default=DATABASE_URL or LOCAL_NORTHWIND_URL)
+    args = parser.parse_args()
+
+    install_fake_llm(args.latency)
+    db_tool = SupabaseDBToolAsync(DBToolConfig(database_url=args.db))
+    await db_tool.start()
+    try:
+        sync_graph = build_graph(db_tool, async_nodes=False)
+        async_graph = build_graph(db_tool, async_nodes=True)
+
+        n = args.requests
+        print(f"{n} requests, 4 LLM calls each at {args.latency * 1000:.0f} ms, db={args.db}")
+        baseline = await run(async_graph, n, concurrent=False)
+        print(f"{'mode':<12}{'wall s':>10}{'req/s':>10}{'overlap':>10}{'loop lag ms':>14}{'ok':>6}")
+        for name, graph, concurrent in (
+            ("sequential", async_graph, False),
+            ("sync", sync_graph, True),
+            ("async", async_graph, True),
+        ):
+            r = baseline if name == "sequential" else await run(graph, n, concurrent)
+            print(
+                f"{name:<12}{r['wall']:>10.2f}{n / r['wall']:>10.1f}"
+                f"{baseline['wall'] / r['wall']:>10.1f}{r['lag'] * 1000:>14.1f}{r['ok']:>6}"
+            )
+    finally:
+        await db_tool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
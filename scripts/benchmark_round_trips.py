@@ -0,0 +1,108 @@
+'''
+Benchmarks the per-query round trips of the DB tool execution paths.
+
+- legacy:      3x SET LOCAL + EXPLAIN + fetch as separate messages (old run_sql)
+- transaction: timeout_mode="transaction" (BEGIN/SET LOCAL batched, then ROLLBACK)
+- pool:        timeout_mode="pool" (timeouts set once via server_settings)
+
+The "ping" row is a bare SELECT 1 and approximates the cost of one round trip,
+so (legacy - pool) / ping should come out close to the number of round trips removed.
+
+Usage:
+    python scripts/benchmark_round_trips.py [iterations]
+'''
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+load_dotenv(PROJECT_ROOT / ".env")
+
+import asyncpg
+
+from src.database.db_tool import DBToolConfig, SupabaseDBToolAsync, enforce_limit_wrapper
+
+SUPABASE_DB_URL = os.environ["SUPABASE_DB_URL"]
+QUERY = 'SELECT "CompanyName", "Country" FROM customers WHERE "Country" = \'Germany\''
+
+
+def _summary(samples):
+    samples = sorted(samples)
+    return statistics.mean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.95) - 1]
+
+
+async def _time(fn, iterations):
+    await fn()  # warm up (connection, prepared statements)
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+async def bench_ping(iterations):
+    conn = await asyncpg.connect(SUPABASE_DB_URL)
+    try:
+        return await _time(lambda: conn.fetchval("SELECT 1"), iterations)
+    finally:
+        await conn.close()
+
+
+async def bench_legacy(iterations):
+    cfg = DBToolConfig(database_url=SUPABASE_DB_URL)
+    final_sql = enforce_limit_wrapper(QUERY, cfg.max_rows)
+    conn = await asyncpg.connect(SUPABASE_DB_URL)
+
+    async def once():
+        await conn.execute(f"SET LOCAL statement_timeout = {cfg.statement_timeout_ms};")
+        await conn.execute(f"SET LOCAL lock_timeout = {cfg.lock_timeout_ms};")
+        await conn.execute(f"SET LOCAL idle_in_transaction_session_timeout = {cfg.idle_in_tx_timeout_ms};")
+        await conn.fetch(f"EXPLAIN (FORMAT JSON) {final_sql}")
+        await conn.fetch(final_sql)
+
+    try:
+        return await _time(once, iterations)
+    finally:
+        await conn.close()
+
+
+async def bench_tool(timeout_mode, iterations):
+    tool = SupabaseDBToolAsync(DBToolConfig(database_url=SUPABASE_DB_URL, timeout_mode=timeout_mode))
+    await tool.start()
+    try:
+        return await _time(lambda: tool.run_sql(QUERY), iterations)
+    finally:
+        await tool.close()
+
+
+async def main(iterations):
+    results = {
+        "ping": await bench_ping(iterations),
+        "legacy": await bench_legacy(iterations),
+        "transaction": await bench_tool("transaction", iterations),
+        "pool": await bench_tool("pool", iterations),
+    }
+
+    print(f"{'path':<12} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, samples in results.items():
+        mean, p50, p95 = _summary(samples)
+        print(f"{name:<12} {mean:>9.2f} {p50:>9.2f} {p95:>9.2f}")
+
+    ping = _summary(results["ping"])[1]
+    legacy = _summary(results["legacy"])[1]
+    for name in ("transaction", "pool"):
+        saved = legacy - _summary(results[name])[1]
+        print(f"{name}: saves {saved:.2f} ms/query (~{saved / ping:.1f} round trips of {ping:.2f} ms)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
@@ -0,0 +1,134 @@
+'''
+Benchmark: full NL->SQL prompt vs the schema-pruned prompt on the golden sets.
+
+For every question in tests/data/golden_set.json and tests/data/ground_truth.csv:
+- prompt tokens with the full schema (NLQ_TO_SQL_PROMPT) and with only the
+  tables picked by src.agent.schema_retriever (tiktoken when its encoding is
+  available, else ~4 chars per token)
+- table recall: did the pruned prompt keep every table the reference SQL uses
+- retrieval time
+
+With --llm N the first N questions are also sent to the model with both prompts
+(needs OPENAI_API_KEY) and the API-reported prompt tokens and latency are compared.
+
+    python scripts/benchmark_schema_pruning.py [--llm 20]
+'''
+
+import argparse
+import csv
+import json
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from langchain_core.messages import SystemMessage
+
+from src.agent.prompts import NLQ_TO_SQL_PROMPT, SCHEMA_TABLES, build_nlq_prompt
+from src.agent.schema_retriever import SchemaRetriever
+
+DATA_DIR = PROJECT_ROOT / "tests" / "data"
+
+
+def token_counter():
+    try:
+        import tiktoken
+        for name in ("o200k_base", "cl100k_base"):
+            try:
+                enc = tiktoken.get_encoding(name)
+                return name, lambda text: len(enc.encode(text))
+            except Exception:
+                continue
+    except ImportError:
+        pass
+    return "chars/4", lambda text: len(text) // 4
+
+
+def load_cases():
+    cases = []
+    golden = json.loads((DATA_DIR / "golden_set.json").read_text(encoding="utf-8"))
+    for case in golden["evaluations"]:
+        cases.append((case["user_question"], set(case["ground_truth_tables"])))
+    with open(DATA_DIR / "ground_truth.csv", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            tables = {t.lower() for t in re.findall(r'(?:from|join)\s+"?(\w+)"?', row["correct_sql"], re.I)}
+            cases.append((row["natural_language_question"], tables & set(SCHEMA_TABLES)))
+    return cases
+
+
+def _pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm", type=int, default=0, help="also call the model for the first N questions")
+    args = parser.parse_args()
+
+    encoding, count = token_counter()
+    retriever = SchemaRetriever()
+    cases = load_cases()
+
+    full_tokens = count(NLQ_TO_SQL_PROMPT)
+    rows, misses = [], []
+    for question, expected in cases:
+        t0 = time.perf_counter()
+        tables = retriever.retrieve(question)
+        retrieve_ms = (time.perf_counter() - t0) * 1000
+        template = build_nlq_prompt(tables) if tables else NLQ_TO_SQL_PROMPT
+        pruned_tokens = count(template.replace("{user_question}", question))
+        missing = expected - set(tables or SCHEMA_TABLES)
+        if missing:
+            misses.append((question, sorted(missing)))
+        rows.append({
+            "question": question,
+            "tables": tables,
+            "full": full_tokens + count(question),
+            "pruned": pruned_tokens,
+            "retrieve_ms": retrieve_ms,
+        })
+
+    full = [r["full"] for r in rows]
+    pruned = [r["pruned"] for r in rows]
+    print(f"{len(rows)} questions, tokens counted with {encoding}")
+    print(f"{'':<14}{'mean':>10}{'p50':>10}{'p95':>10}")
+    print(f"{'full':<14}{statistics.mean(full):>10.0f}{_pct(full, 0.5):>10}{_pct(full, 0.95):>10}")
+    print(f"{'pruned':<14}{statistics.mean(pruned):>10.0f}{_pct(pruned, 0.5):>10}{_pct(pruned, 0.95):>10}")
+    print(f"input tokens saved: {1 - sum(pruned) / sum(full):.1%}")
+    print(f"tables per prompt: {statistics.mean(len(r['tables'] or SCHEMA_TABLES) for r in rows):.1f} of {len(SCHEMA_TABLES)}")
+    print(f"full-schema fallbacks: {sum(1 for r in rows if not r['tables'])}")
+    print(f"table recall: {1 - len(misses) / len(rows):.1%} of questions keep every reference table")
+    print(f"retrieval: {statistics.mean(r['retrieve_ms'] for r in rows):.3f} ms mean")
+    for question, missing in misses:
+        print(f"  missing {missing}: {question}")
+
+    if args.llm:
+        from src.agent.llm_clients import get_chat_model
+        llm = get_chat_model()
+        results = {"full": [], "pruned": []}
+        for r in rows[:args.llm]:
+            prompts = {
+                "full": NLQ_TO_SQL_PROMPT,
+                "pruned": build_nlq_prompt(r["tables"]) if r["tables"] else NLQ_TO_SQL_PROMPT,
+            }
+            for name, template in prompts.items():
+                t0 = time.perf_counter()
+                response = llm.generate([[SystemMessage(content=template.replace("{user_question}", r["question"]))]])
+                elapsed = time.perf_counter() - t0
+                usage = (response.llm_output or {}).get("token_usage") or {}
+                results[name].append((elapsed, usage.get("prompt_tokens") or 0))
+        print(f"\nLLM ({args.llm} questions)")
+        print(f"{'':<14}{'p50 s':>10}{'p95 s':>10}{'prompt tok':>12}")
+        for name, samples in results.items():
+            latencies = [s[0] for s in samples]
+            print(f"{name:<14}{_pct(latencies, 0.5):>10.2f}{_pct(latencies, 0.95):>10.2f}"
+                  f"{statistics.mean(s[1] for s in samples):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+'''
+Micro-benchmark: JSON encoding of a 5000-row /chat payload.
+
+Builds a synthetic Northwind order_details result (Decimal prices / freight, dates)
+in both envelope formats, then reports encode time per payload for
+- jsonable_encoder: what FastAPI does for a returned dict (jsonable_encoder + json.dumps)
+- clean_data:       the recursive walk tests/Evaluation_match_metric.py used + json.dumps
+- serialization:    src.database.serialization.dumps (orjson when installed)
+
+Runs fully offline:
+    python scripts/benchmark_serialization.py [rows] [repeats]
+'''
+
+import json
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database import serialization
+from src.database.columnar import rows_to_columnar
+
+
+def clean_data(data):
+    # previous tests/Evaluation_match_metric.py implementation
+    if isinstance(data, list):
+        return [clean_data(i) for i in data]
+    elif isinstance(data, dict):
+        return {k: clean_data(v) for k, v in data.items()}
+    elif isinstance(data, Decimal):
+        return float(data)
+    elif isinstance(data, (datetime, date)):
+        return data.isoformat()
+    elif data is None:
+        return None
+    return data
+
+
+def make_rows(n: int):
+    rnd = random.Random(7)
+    start = date(1996, 7, 4)
+    return [
+        {
+            "order_id": 10248 + i // 3,
+            "product_id": rnd.randint(1, 77),
+            "product_name": f"Product {rnd.randint(1, 77)}",
+            "unit_price": Decimal(rnd.randint(250, 26350)) / 100,
+            "quantity": rnd.randint(1, 120),
+            "discount": rnd.choice([0.0, 0.05, 0.1, 0.15, 0.2, 0.25]),
+            "order_date": start + timedelta(days=i // 3),
+            "freight": Decimal(rnd.randint(2, 101000)) / 100,
+            "ship_country": rnd.choice(["Germany", "France", "USA", "Brazil", "UK"]),
+        }
+        for i in range(n)
+    ]
+
+
+def envelope(rows, columnar: bool):
+    columns = list(rows[0])
+    data = rows_to_columnar(rows, columns) if columnar else {"columns": columns, "rows": rows, "row_count": len(rows)}
+    return {
+        "reply": "I've generated a chart based on your data!",
+        "sql_query": "SELECT ... FROM order_details JOIN orders USING (order_id)",
+        "columns": columns,
+        "sample_data": data,
+        "error": None,
+    }
+
+
+def encoders():
+    out = {}
+    try:
+        from fastapi.encoders import jsonable_encoder
+
+        out["jsonable_encoder"] = lambda obj: json.dumps(
+            jsonable_encoder(obj), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+    except ImportError:
+        print("(fastapi not installed: skipping jsonable_encoder)")
+    out["clean_data"] = lambda obj: json.dumps(clean_data(obj), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    out["serialization"] = serialization.dumps
+    return out
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rows = make_rows(n)
+    print(f"{n} rows, {repeats} repeats, encoder: {'orjson' if serialization.orjson else 'stdlib json'}")
+    candidates = encoders()
+
+    for columnar in (False, True):
+        payload = envelope(rows, columnar)
+        print(f"\n{'columnar' if columnar else 'rows'} envelope")
+        baseline = None
+        for name, encode in candidates.items():
+            size = len(encode(payload))
+            t0 = time.perf_counter()
+            for _ in range(repeats):
+                encode(payload)
+            ms = (time.perf_counter() - t0) * 1000 / repeats
+            baseline = baseline or ms
+            print(f"  {name:18s} {ms:8.2f} ms/payload  {size / 1024:8.1f} KiB  x{baseline / ms:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
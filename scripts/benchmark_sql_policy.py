@@ -0,0 +1,133 @@
+'''
+Micro-benchmark: tokenizer-based validate_sql_policy vs. the old regex checks.
+
+Builds a corpus of generated Northwind SELECTs (plus a share of unsafe statements),
+then reports throughput for
+- regex:            the three regexes run_sql used before
+- tokenizer (cold): new validator with its LRU cache cleared before every call
+- tokenizer (warm): new validator with memoization, on a corpus with repeats
+and lists the queries the two implementations disagree on.
+
+Runs fully offline:
+    python scripts/benchmark_sql_policy.py [corpus_size]
+'''
+
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.sql_policy import _check, validate_sql_policy
+
+# --- previous implementation (src/database/db_tool.py before the tokenizer) ---
+_FORBIDDEN = re.compile(
+    r"\b("
+    r"insert|update|delete|drop|alter|truncate|create|grant|revoke|comment|"
+    r"vacuum|analyze|cluster|copy|do|call|execute|listen|notify|"
+    r"security\s+definer|pg_sleep"
+    r")\b",
+    flags=re.IGNORECASE,
+)
+_SELECT_LIKE = re.compile(r"^\s*(with\b.*?\bselect\b|select\b)", flags=re.IGNORECASE | re.DOTALL)
+_SEMICOLON = re.compile(r";")
+
+
+def validate_sql_policy_regex(sql: str, allow_multi_statement: bool) -> Tuple[bool, Optional[str]]:
+    if not isinstance(sql, str) or not sql.strip():
+        return False, "Empty SQL."
+    if not _SELECT_LIKE.search(sql):
+        return False, "Only SELECT queries are allowed (SELECT / WITH ... SELECT)."
+    if _FORBIDDEN.search(sql):
+        return False, "Forbidden operation detected (read-only queries only)."
+    if not allow_multi_statement:
+        if _SEMICOLON.search(sql.strip().rstrip(";")):
+            return False, "Multiple statements are not allowed."
+    return True, None
+
+
+# --- corpus ---
+TABLES = {
+    "customers": ["CustomerID", "CompanyName", "ContactName", "ContactTitle", "City", "Country"],
+    "orders": ["OrderID", "CustomerID", "EmployeeID", "OrderDate", "ShipCountry", "Freight"],
+    "products": ["ProductID", "ProductName", "UnitPrice", "UnitsInStock", "Discontinued"],
+    "employees": ["EmployeeID", "FirstName", "LastName", "Title", "Notes"],
+}
+LITERALS = ["'Germany'", "'do not call'", "'Sales; Marketing'", "'update pending'", "'O''Brien'", "'comment'"]
+UNSAFE = [
+    "DELETE FROM orders",
+    "SELECT 1; DROP TABLE customers",
+    "WITH d AS (DELETE FROM orders RETURNING *) SELECT * FROM d",
+    "SELECT pg_sleep(5)",
+    "SELECT * INTO backup FROM orders",
+    "UPDATE products SET \"UnitPrice\" = 0",
+]
+
+
+def generate_query(rng: random.Random) -> str:
+    table = rng.choice(list(TABLES))
+    cols = rng.sample(TABLES[table], k=rng.randint(1, 3))
+    select = ", ".join(f'"{c}"' for c in cols)
+    where = f'"{rng.choice(TABLES[table])}" = {rng.choice(LITERALS)}'
+    shape = rng.random()
+    if shape < 0.4:
+        return f'SELECT {select} FROM {table} WHERE {where} ORDER BY 1 LIMIT {rng.randint(1, 50)}'
+    if shape < 0.7:
+        return (
+            f'WITH base AS (SELECT {select} FROM {table} WHERE {where}) '
+            f'SELECT COUNT(*) AS cnt FROM base'
+        )
+    if shape < 0.9:
+        return (
+            f'SELECT t."{cols[0]}", COUNT(*) AS n FROM {table} t '
+            f'WHERE t."{cols[0]}" IN (SELECT "{cols[0]}" FROM {table} WHERE {where}) '
+            f'GROUP BY t."{cols[0]}" HAVING COUNT(*) > {rng.randint(1, 5)}'
+        )
+    return rng.choice(UNSAFE)
+
+
+def throughput(fn, corpus) -> float:
+    t0 = time.perf_counter()
+    for sql in corpus:
+        fn(sql, False)
+    return len(corpus) / (time.perf_counter() - t0)
+
+
+def main(size: int) -> None:
+    rng = random.Random(7)
+    unique = [generate_query(rng) for _ in range(size)]
+    # realistic traffic: repair retries and repeated dashboard questions
+    repeated = [rng.choice(unique[: max(1, size // 10)]) for _ in range(size)]
+
+    def cold(sql, allow_multi):
+        _check.cache_clear()
+        return validate_sql_policy(sql, allow_multi)
+
+    regex_qps = throughput(validate_sql_policy_regex, unique)
+    cold_qps = throughput(cold, unique)
+    _check.cache_clear()
+    warm_qps = throughput(validate_sql_policy, repeated)
+
+    print(f"corpus: {size} queries ({len(set(unique))} unique)")
+    print(f"{'validator':<20} {'queries/s':>12}")
+    print(f"{'regex':<20} {regex_qps:>12,.0f}")
+    print(f"{'tokenizer (cold)':<20} {cold_qps:>12,.0f}")
+    print(f"{'tokenizer (warm)':<20} {warm_qps:>12,.0f}")
+    print(f"cache: {_check.cache_info()}")
+
+    disagreements = {}
+    for sql in set(unique):
+        old, new = validate_sql_policy_regex(sql, False), validate_sql_policy(sql, False)
+        if old[0] != new[0]:
+            disagreements[sql] = (old, new)
+    print(f"\n{len(disagreements)} distinct queries where the validators disagree")
+    for sql, (old, new) in list(disagreements.items())[:10]:
+        print(f"- regex={old[0]} tokenizer={new[0]}: {sql}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
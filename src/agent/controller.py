@@ -1,9 +1,8 @@
-from langchain_community.chat_models import ChatOpenAI
 from langchain_core.messages import SystemMessage
 from src.agent.prompts import DAILOG_PROMPTS
-from src.config import OPENAI_API_KEY
+from src.agent.llm_clients import get_chat_model
 
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0 ,openai_api_key=OPENAI_API_KEY)
+llm = get_chat_model("gpt-4o-mini", temperature=0)
 
 def run_master_agent(messages):
     """
@@ -16,4 +15,13 @@ def run_master_agent(messages):
     return response
 
 
+async def arun_master_agent(messages):
+    """
+    Async run_master_agent: awaits the LLM instead of blocking a worker thread.
+    """
+    system_instruction = SystemMessage(content=DAILOG_PROMPTS["controller_system"])
+
+    return await llm.ainvoke([system_instruction] + messages)
+
+
 
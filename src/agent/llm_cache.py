@@ -0,0 +1,148 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.globals import get_llm_cache, set_llm_cache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[2] / ".cache" / "llm"
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    '''
+    Content address of one LLM call. LangChain passes the serialized messages as
+    `prompt` and the model name plus every parameter (temperature,
+    response_format, ...) as `llm_string`.
+    '''
+    return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class DiskLLMCache(BaseCache):
+    '''
+    Persistent exact-match LLM cache: one JSON file per call under
+    <directory>/<key[:2]>/<key>.json.
+
+    Installed as LangChain's global cache, so every ChatOpenAI call (agent
+    helpers, graph nodes, chains) is looked up here before hitting the API.
+    Total size is bounded by max_bytes: the least recently used files are deleted
+    first (a hit refreshes the file's mtime, so recency survives restarts).
+    '''
+
+    def __init__(self, directory: Optional[Path] = None, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = Path(directory or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()  # key -> bytes, LRU order
+        self._bytes = 0
+        self._load_index()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _load_index(self) -> None:
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            st = path.stat()
+            entries.append((st.st_mtime, path.stem, st.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self._bytes += size
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._sizes:
+            key, size = self._sizes.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = cache_key(prompt, llm_string)
+        path = self._path(key)
+        try:
+            payload = path.read_text(encoding="utf-8")
+            generations = loads(payload)
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            if key in self._sizes:
+                self._sizes.move_to_end(key)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = cache_key(prompt, llm_string)
+        path = self._path(key)
+        payload = dumps(list(return_val))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_text(payload, encoding="utf-8")
+        os.replace(tmp, path)  # atomic: readers never see a partial file
+
+        size = len(payload.encode("utf-8"))
+        with self._lock:
+            self._bytes += size - self._sizes.pop(key, 0)
+            self._sizes[key] = size
+            self.writes += 1
+            self._evict()
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            for key in list(self._sizes):
+                try:
+                    self._path(key).unlink()
+                except FileNotFoundError:
+                    pass
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "directory": str(self.directory),
+            "entries": len(self._sizes),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
+
+
+def install_llm_cache(directory: Optional[Path] = None, max_bytes: Optional[int] = None) -> Optional[DiskLLMCache]:
+    '''
+    Install the disk cache as LangChain's global LLM cache (idempotent).
+
+    LLM_CACHE=0 disables it; LLM_CACHE_DIR and LLM_CACHE_MAX_MB override the
+    defaults (.cache/llm, 256 MB).
+    '''
+    if os.getenv("LLM_CACHE", "1") == "0":
+        return None
+    current = get_llm_cache()
+    if isinstance(current, DiskLLMCache):
+        return current
+    if max_bytes is None:
+        max_bytes = int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024)
+    cache = DiskLLMCache(directory or os.getenv("LLM_CACHE_DIR") or None, max_bytes=max_bytes)
+    set_llm_cache(cache)
+    return cache
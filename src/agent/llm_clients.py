@@ -0,0 +1,237 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import openai
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from langchain_core.pydantic_v1 import Field
+from langchain_openai import ChatOpenAI
+
+from src.config import OPENAI_API_KEY
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# gpt-4o-mini tier-1 limits; override with OPENAI_RPM / OPENAI_TPM (0 disables a limit)
+DEFAULT_RPM = 500
+DEFAULT_TPM = 200_000
+
+# completion allowance reserved up front when the call sets no max_tokens;
+# the difference to the real usage is handed back once the response arrives
+DEFAULT_COMPLETION_TOKENS = 512
+
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    # ~4 characters per token for English / SQL, plus the per-message framing
+    return sum(len(str(m.content)) // 4 + 4 for m in messages)
+
+
+class TokenBucket:
+    '''
+    capacity units, refilled continuously at capacity / period. take() may drive
+    the level negative: the caller then waits until its debt is refilled, so
+    concurrent callers queue in arrival order instead of polling.
+    '''
+
+    def __init__(self, capacity: float, period_s: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period_s
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount: float, now: float) -> float:
+        '''
+        Reserve amount; returns the seconds to wait before using it.
+        '''
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / self.rate)
+
+    def give_back(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    '''
+    Requests/minute + tokens/minute scheduler shared by every chat client.
+
+    acquire() / aacquire() reserve one request and the estimated tokens and sleep
+    until both buckets cover them; settle() corrects the token reservation with
+    the usage the API reported. Bursts therefore queue smoothly on our side
+    instead of turning into 429s and SDK retries.
+    '''
+
+    def __init__(self, rpm: int = DEFAULT_RPM, tpm: int = DEFAULT_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = TokenBucket(rpm) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self.wait_s = 0.0
+        self.tokens_used = 0
+
+    def _reserve(self, tokens: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            wait = 0.0
+            if self._requests is not None:
+                wait = max(wait, self._requests.take(1, now))
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.take(tokens, now))
+            self.calls += 1
+            if wait > 0:
+                self.throttled += 1
+                self.wait_s += wait
+            return wait
+
+    def acquire(self, tokens: int) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def settle(self, reserved: int, used: Optional[int]) -> None:
+        if used is None:
+            return
+        with self._lock:
+            self.tokens_used += used
+            if self._tokens is not None and used != reserved:
+                self._tokens.give_back(reserved - used, time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "wait_s": round(self.wait_s, 3),
+            "tokens_used": self.tokens_used,
+        }
+
+
+class ScheduledChatOpenAI(ChatOpenAI):
+    '''
+    ChatOpenAI that reserves capacity on a RateLimiter before each API call.
+    LLM cache hits never reach _generate, so they are not throttled.
+    '''
+
+    # excluded so the LLM cache key (llm_string) stays stable across processes
+    limiter: Optional[Any] = Field(default=None, exclude=True)
+
+    def _reservation(self, messages: List[BaseMessage]) -> int:
+        return estimate_tokens(messages) + (self.max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+    @staticmethod
+    def _used(result: ChatResult) -> Optional[int]:
+        usage = (result.llm_output or {}).get("token_usage") or {}
+        return usage.get("total_tokens")
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.limiter is None:
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        reserved = self._reservation(messages)
+        self.limiter.acquire(reserved)
+        result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self.limiter.settle(reserved, self._used(result))
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.limiter is None:
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        reserved = self._reservation(messages)
+        await self.limiter.aacquire(reserved)
+        result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self.limiter.settle(reserved, self._used(result))
+        return result
+
+
+class LLMClientRegistry:
+    '''
+    One chat model per (model, temperature, json_mode), all sharing a single
+    openai.OpenAI / openai.AsyncOpenAI pair, i.e. one HTTP connection pool with
+    keep-alive and TLS session reuse, and one RateLimiter.
+    '''
+
+    def __init__(self, api_key: Optional[str] = None, limiter: Optional[RateLimiter] = None):
+        self.api_key = api_key or OPENAI_API_KEY
+        self.limiter = limiter
+        self._lock = threading.Lock()
+        self._models: Dict[Tuple[str, float, bool], ScheduledChatOpenAI] = {}
+        self._client: Optional[openai.OpenAI] = None
+        self._async_client: Optional[openai.AsyncOpenAI] = None
+
+    def _clients(self) -> Tuple[openai.OpenAI, openai.AsyncOpenAI]:
+        if self._client is None:
+            self._client = openai.OpenAI(api_key=self.api_key)
+            self._async_client = openai.AsyncOpenAI(api_key=self.api_key)
+        return self._client, self._async_client
+
+    def get(self, model: Optional[str] = None, temperature: float = 0, json_mode: bool = False) -> ScheduledChatOpenAI:
+        key = (model or DEFAULT_MODEL, float(temperature), json_mode)
+        with self._lock:
+            llm = self._models.get(key)
+            if llm is None:
+                client, async_client = self._clients()
+                llm = ScheduledChatOpenAI(
+                    model=key[0],
+                    temperature=temperature,
+                    openai_api_key=self.api_key,
+                    client=client.chat.completions,
+                    async_client=async_client.chat.completions,
+                    model_kwargs={"response_format": {"type": "json_object"}} if json_mode else {},
+                    limiter=self.limiter,
+                )
+                self._models[key] = llm
+            return llm
+
+    async def aclose(self) -> None:
+        with self._lock:
+            client, async_client = self._client, self._async_client
+            self._client = self._async_client = None
+            self._models.clear()
+        if async_client is not None:
+            await async_client.close()
+        if client is not None:
+            client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "models": [{"model": m, "temperature": t, "json_mode": j} for m, t, j in self._models],
+            "rate_limit": self.limiter.stats() if self.limiter is not None else {"enabled": False},
+        }
+
+
+_registry: Optional[LLMClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_llm_registry() -> LLMClientRegistry:
+    '''
+    Process-wide registry. OPENAI_RPM / OPENAI_TPM set the rate limits
+    (defaults 500 / 200000, both 0 turns the scheduler off).
+    '''
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            rpm = int(os.getenv("OPENAI_RPM", str(DEFAULT_RPM)))
+            tpm = int(os.getenv("OPENAI_TPM", str(DEFAULT_TPM)))
+            limiter = RateLimiter(rpm, tpm) if rpm > 0 or tpm > 0 else None
+            _registry = LLMClientRegistry(limiter=limiter)
+        return _registry
+
+
+def get_chat_model(model: Optional[str] = None, temperature: float = 0, json_mode: bool = False) -> ScheduledChatOpenAI:
+    return get_llm_registry().get(model, temperature, json_mode)
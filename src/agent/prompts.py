@@ -1,10 +1,10 @@
-from src.metadata.data_dictionary import DICT_PROMPT
+from src.metadata.data_dictionary import DICT_PROMPT, FOREIGN_KEYS, format_dict_prompt
 
 
 
 
 
-NLQ_TO_SQL_PROMPT = """
+NLQ_TO_SQL_INTRO = """
 Act as a senior data analyst who is an expert in Natural Language Query (NLQ) to SQL generation. Your task is to convert natural language questions into accurate, executable SQL queries for a PostgreSQL database.
 
 You will be provided with:
@@ -16,7 +16,10 @@ Your goal is to generate syntactically correct and semantically accurate Postgre
 
 Database Schema:
 
-employees ||--|| employees : "reports to"
+"""
+
+# mermaid ER relationships, one per line
+SCHEMA_RELATIONSHIPS = """employees ||--|| employees : "reports to"
 employees ||--o{ employee_territories : through
 orders }o--|| shippers : "ships via"
 order_details }o--|| orders : have
@@ -27,15 +30,16 @@ territories ||--|| regions : in
 employee_territories }o--|| territories : have
 orders }o--|| customers : place
 orders }o--|| employees : "sold by"
+"""
 
-categories {
+SCHEMA_TABLES = {
+    "categories": """categories {
 int CategoryID PK
 string CategoryName
 string Description
 string Picture
-}
-
-customers {
+}""",
+    "customers": """customers {
 string CustomerID PK
 string CompanyName
 string ContactName
@@ -47,9 +51,8 @@ string PostalCode
 string Country
 string Phone
 string Fax
-}
-
-employees {
+}""",
+    "employees": """employees {
 int EmployeeID PK
 string LastName
 string FirstName
@@ -68,22 +71,19 @@ string Photo
 string Notes
 int ReportsTo FK
 string PhotoPath
-}
-
-employee_territories {
+}""",
+    "employee_territories": """employee_territories {
 int EmployeeID PK, FK
 string TerritoryID PK, FK
-}
-
-order_details {
+}""",
+    "order_details": """order_details {
 int OrderID PK, FK
 int ProductID PK, FK
 float UnitPrice
 int Quantity
 float Discount
-}
-
-orders {
+}""",
+    "orders": """orders {
 int OrderID PK
 string CustomerID FK
 int EmployeeID FK
@@ -98,9 +98,8 @@ string ShipCity
 string ShipRegion
 string ShipPostalCode
 string ShipCountry
-}
-
-products {
+}""",
+    "products": """products {
 int ProductID PK
 string ProductName
 int SupplierID FK
@@ -111,20 +110,17 @@ int UnitsInStock
 int UnitsOnOrder
 int ReorderLevel
 string Discontinued
-}
-
-regions {
+}""",
+    "regions": """regions {
 int RegionID PK
 string RegionDescription
-}
-
-shippers {
+}""",
+    "shippers": """shippers {
 int ShipperID PK
 string CompanyName
 string Phone
-}
-
-suppliers {
+}""",
+    "suppliers": """suppliers {
 int SupplierID PK
 string CompanyName
 string ContactName
@@ -137,15 +133,15 @@ string Country
 string Phone
 string Fax
 string HomePage
-}
-
-territories {
+}""",
+    "territories": """territories {
 string TerritoryID PK
 string TerritoryDescription
 int RegionID FK
+}""",
 }
 
-""" + DICT_PROMPT + """
+NLQ_TO_SQL_INSTRUCTIONS = """
 
 ## Instructions
 
@@ -234,6 +230,43 @@ Return only the SQL query without any explanation or additional text. The query
 {user_question}
 """
 
+NLQ_TO_SQL_PROMPT = (
+    NLQ_TO_SQL_INTRO
+    + SCHEMA_RELATIONSHIPS
+    + "\n"
+    + "".join(block + "\n\n" for block in SCHEMA_TABLES.values())
+    + DICT_PROMPT
+    + NLQ_TO_SQL_INSTRUCTIONS
+)
+
+
+def build_nlq_prompt(tables) -> str:
+    """
+    NLQ_TO_SQL_PROMPT restricted to the given tables: their definitions, the
+    relationships and join keys among them and their part of the data dictionary.
+    """
+    wanted = set(tables)
+    tables = [t for t in SCHEMA_TABLES if t in wanted]
+    relationships = [
+        line for line in SCHEMA_RELATIONSHIPS.splitlines()
+        if line and {line.split()[0], line.split()[2]} <= wanted
+    ]
+    join_keys = [
+        f'"{t}"."{c}" = "{rt}"."{rc}"'
+        for t, c, rt, rc in FOREIGN_KEYS
+        if t in wanted and rt in wanted
+    ]
+    return (
+        NLQ_TO_SQL_INTRO
+        + "".join(line + "\n" for line in relationships)
+        + ("\nJoin keys:\n" + "".join(k + "\n" for k in join_keys) if join_keys else "")
+        + "\n"
+        + "".join(SCHEMA_TABLES[t] + "\n\n" for t in tables)
+        + format_dict_prompt(tables)
+        + NLQ_TO_SQL_INSTRUCTIONS
+    )
+
+
 DAILOG_PROMPTS = {
     "controller_system": """
     You are the QueryMate Master Orchestrator. You manage the interaction between the user and a team of data agents.
@@ -0,0 +1,227 @@
+import difflib
+import json
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.agent.schema_retriever import table_phrases
+from src.database.sql_policy import PolicyTokenizeError, tokenize
+from src.metadata.data_dictionary import DATA_DICTIONARY, FOREIGN_KEYS
+
+# (SQLSTATE, pattern capturing the offending identifier); PostgreSQL wording
+# first, then the embedded SQLite backend's. Also used to infer a missing SQLSTATE.
+_ERROR_PATTERNS = [
+    ("42703", re.compile(r'column ((?:"?\w+"?\.)?"?\w+"?) does not exist', re.I)),
+    ("42703", re.compile(r'no such column: ([\w."]+)', re.I)),
+    ("42P01", re.compile(r'relation "?([\w.]+)"? does not exist', re.I)),
+    ("42P01", re.compile(r'no such table: ([\w."]+)', re.I)),
+    ("42702", re.compile(r'column reference "?([\w.]+)"? is ambiguous', re.I)),
+    ("42702", re.compile(r'ambiguous column name: ([\w."]+)', re.I)),
+    ("42803", re.compile(r'column "?([\w."]+?)"? must appear in the GROUP BY', re.I)),
+    ("42883", re.compile(r'function ([\w.]+)\(.*\) does not exist', re.I)),
+    ("42883", re.compile(r'no such function: ([\w.]+)', re.I)),
+    ("42601", re.compile(r'at or near "([^"]+)"', re.I)),
+    ("42601", re.compile(r'near "([^"]+)": syntax error', re.I)),
+]
+
+_KINDS = {
+    "42703": "undefined_column",
+    "42P01": "undefined_table",
+    "42702": "ambiguous_column",
+    "42803": "grouping_error",
+    "42883": "undefined_function",
+    "42601": "syntax_error",
+}
+
+_NOT_ALIASES = frozenset({
+    "on", "using", "where", "group", "order", "having", "limit", "offset", "join", "inner", "left",
+    "right", "full", "cross", "natural", "union", "intersect", "except", "window", "lateral", "fetch",
+})
+
+
+@dataclass(frozen=True)
+class RepairContext:
+    '''
+    What a failed query touched and what the error points at: the dictionary
+    tables to show the repair agent and the closest real names for the
+    offending identifier.
+    '''
+
+    sqlstate: Optional[str]
+    kind: str
+    identifier: Optional[str]
+    tables: Tuple[str, ...]
+    suggestions: Tuple[str, ...] = field(default=())
+
+    def error_text(self, error_info: Dict[str, Any]) -> str:
+        parts = [f"[{self.sqlstate or 'unknown'} {self.kind}] {error_info.get('message')}"]
+        if error_info.get("hint"):
+            parts.append(f"Hint: {error_info['hint']}")
+        if self.suggestions:
+            parts.append(f"Closest dictionary matches for {self.identifier!r}: " + "; ".join(self.suggestions))
+        return "\n".join(parts)
+
+
+def parse_db_error(error_info: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    '''
+    (sqlstate, qualifier, identifier) from an error envelope's "error" dict:
+    column o."ShipDate" does not exist -> ("42703", "o", "ShipDate").
+    '''
+    message = error_info.get("message") or ""
+    sqlstate = error_info.get("code")
+    for state, pattern in _ERROR_PATTERNS:
+        if sqlstate and state != sqlstate:
+            continue
+        m = pattern.search(message)
+        if m:
+            qualifier, _, name = m.group(1).replace('"', "").rpartition(".")
+            return sqlstate or state, qualifier or None, name
+    return sqlstate, None, None
+
+
+def referenced_tables(sql: str) -> Dict[str, str]:
+    '''
+    alias (or table name) -> table for every table in FROM / JOIN clauses.
+    '''
+    try:
+        tokens = tokenize(sql or "")
+    except PolicyTokenizeError:
+        return {}
+    aliases: Dict[str, str] = {}
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        if tok.kind == "word" and tok.value in ("from", "join"):
+            i += 1
+            while i < len(tokens) and tokens[i].kind in ("word", "qident") and tokens[i].value not in _NOT_ALIASES:
+                table = tokens[i].value.lower()
+                aliases[table] = table
+                i += 1
+                if i < len(tokens) and tokens[i].kind == "word" and tokens[i].value == "as":
+                    i += 1
+                if i < len(tokens) and tokens[i].kind in ("word", "qident") and tokens[i].value not in _NOT_ALIASES:
+                    aliases[tokens[i].value.lower()] = table
+                    i += 1
+                if tok.value == "from" and i < len(tokens) and tokens[i].kind == "punct" and tokens[i].value == ",":
+                    i += 1
+                    continue
+                break
+            continue
+        i += 1
+    return aliases
+
+
+def _norm(name: str) -> str:
+    return re.sub(r"[\W_]+", "", name.lower())
+
+
+def _column_names(dictionary: Dict[str, Any], tables) -> Dict[str, List[Tuple[str, str]]]:
+    # normalized column name / synonym -> [(table, column)]
+    names: Dict[str, List[Tuple[str, str]]] = {}
+    for table in tables:
+        for column, info in dictionary["tables"][table]["columns"].items():
+            for name in [column, *info.get("synonyms", [])]:
+                refs = names.setdefault(_norm(name), [])
+                if (table, column) not in refs:
+                    refs.append((table, column))
+    return names
+
+
+def _nearest_columns(dictionary: Dict[str, Any], identifier: str, scope) -> List[Tuple[str, str]]:
+    '''
+    (table, column) pairs the identifier most likely meant: an exact
+    case-insensitive name / synonym match (in the query's tables if there is
+    one there, else anywhere), else close spellings within the query's tables, else anywhere.
+    '''
+    key = _norm(identifier)
+    everywhere = _column_names(dictionary, list(dictionary["tables"]))
+    if key in everywhere:
+        exact = everywhere[key]
+        return ([ref for ref in exact if ref[0] in scope] or exact)[:3]
+    for names in (_column_names(dictionary, scope), everywhere):
+        found: List[Tuple[str, str]] = []
+        for close in difflib.get_close_matches(key, list(names), n=3, cutoff=0.6):
+            for ref in names[close]:
+                if ref not in found:
+                    found.append(ref)
+        if found:
+            return found[:3]
+    return []
+
+
+def build_repair_context(sql: str, error_info: Dict[str, Any], dictionary: Optional[Dict[str, Any]] = None) -> RepairContext:
+    '''
+    Tables of the failed SQL plus whatever the offending identifier most
+    likely meant (a column of a table that is not joined yet, the real name of
+    a misspelled table). Empty tables means the SQL could not be related to
+    the dictionary: show all of it.
+    '''
+    dictionary = dictionary if dictionary is not None else DATA_DICTIONARY
+    known = dictionary["tables"]
+    sqlstate, qualifier, identifier = parse_db_error(error_info)
+    kind = _KINDS.get(sqlstate or "", "other")
+
+    aliases = referenced_tables(sql)
+    tables = [t for t in known if t in aliases.values()]
+    suggestions: List[str] = []
+
+    if identifier and kind in ("undefined_column", "ambiguous_column", "grouping_error"):
+        scope = [aliases[qualifier.lower()]] if qualifier and aliases.get(qualifier.lower()) in known else tables
+        nearest = _nearest_columns(dictionary, identifier, scope)
+        for table, column in nearest:
+            synonyms = ", ".join(known[table]["columns"][column].get("synonyms", []))
+            suggestions.append(f'{table}."{column}"' + (f" (synonyms: {synonyms})" if synonyms else ""))
+            if table not in tables:
+                tables.append(table)
+    elif identifier and kind == "undefined_table":
+        phrases = {**{t: t for t in known}, **{p: t for p, t in table_phrases().items() if t in known}}
+        by_norm = {_norm(p): t for p, t in phrases.items()}
+        for key in difflib.get_close_matches(_norm(identifier), list(by_norm), n=3, cutoff=0.6):
+            table = by_norm[key]
+            if f'"{table}"' not in suggestions:
+                suggestions.append(f'"{table}"')
+            if table not in tables:
+                tables.append(table)
+
+    return RepairContext(
+        sqlstate=sqlstate,
+        kind=kind,
+        identifier=identifier,
+        tables=tuple(t for t in known if t in tables),
+        suggestions=tuple(suggestions),
+    )
+
+
+def slice_dictionary(tables, dictionary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    dictionary = dictionary if dictionary is not None else DATA_DICTIONARY
+    if not tables:
+        return dictionary
+    return {"tables": {t: info for t, info in dictionary["tables"].items() if t in tables}}
+
+
+def _dictionary_section(tables: Tuple[str, ...], dictionary: Dict[str, Any]) -> str:
+    text = json.dumps(slice_dictionary(tables, dictionary), separators=(",", ":"))
+    join_keys = [
+        f'"{t}"."{c}" = "{rt}"."{rc}"'
+        for t, c, rt, rc in FOREIGN_KEYS
+        if t in tables and rt in tables
+    ]
+    if join_keys:
+        text += "\n\nJOIN KEYS:\n" + "\n".join(join_keys)
+    return text
+
+
+@lru_cache(maxsize=128)
+def _default_dictionary_section(tables: Tuple[str, ...]) -> str:
+    return _dictionary_section(tables, DATA_DICTIONARY)
+
+
+def dictionary_section(tables: Tuple[str, ...], dictionary: Optional[Dict[str, Any]] = None) -> str:
+    '''
+    Compact dictionary slice plus the join keys among the tables. Built once
+    per table set for DATA_DICTIONARY (the repair system prompt is otherwise constant).
+    '''
+    if dictionary is None or dictionary is DATA_DICTIONARY:
+        return _default_dictionary_section(tuple(tables))
+    return _dictionary_section(tuple(tables), dictionary)
@@ -0,0 +1,202 @@
+import os
+import re
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+
+from src.agent.prompts import SCHEMA_TABLES
+from src.metadata.data_dictionary import DATA_DICTIONARY, FOREIGN_KEYS
+
+# Business wording that implies a table without naming one of its columns
+# (takes precedence over the dictionary synonyms).
+_TERM_TABLES = {
+    "revenue": ["order_details"],
+    "sales": ["order_details"],
+    "sold": ["order_details"],
+    "spent": ["order_details"],
+    "spend": ["order_details"],
+    "units": ["order_details"],
+    "line items": ["order_details"],
+    "order details": ["order_details"],
+    "shipped": ["orders"],
+    "shipping": ["orders"],
+    "late": ["orders"],
+    "delay": ["orders"],
+    "purchase": ["orders"],
+    "delivery": ["orders"],
+    "freight cost": ["orders"],
+    "placed by": ["customers"],
+    "supplied": ["suppliers"],
+    "product category": ["categories"],
+    "year": ["orders"],
+    "month": ["orders"],
+    "quarter": ["orders"],
+    "order value": ["order_details"],
+    "employee": ["employees"],
+    "staff": ["employees"],
+    "salesperson": ["employees"],
+    "sales rep": ["employees"],
+    "hired": ["employees"],
+    "territory": ["territories"],
+    "regions": ["regions"],
+    "region description": ["regions"],
+    "beverages": ["categories"],
+    "seafood": ["categories"],
+    "condiments": ["categories"],
+    "confections": ["categories"],
+    "dairy": ["categories"],
+    "out of stock": ["products"],
+}
+
+# Association tables are only meaningful together with the tables they link.
+_COMPANIONS = {
+    "order_details": ["orders", "products"],
+    "employee_territories": ["employees", "territories"],
+}
+
+_YEAR = re.compile(r"\b(19|20)\d\d\b")  # order dates are the only dates most questions filter on
+
+# When a phrase fits several tables ("country", "city") and none of them is
+# selected yet, the most central one wins.
+_CENTRALITY = ["orders", "customers", "products", "order_details", "employees", "suppliers",
+               "categories", "shippers", "territories", "employee_territories", "regions"]
+
+
+def _variants(phrase: str) -> List[str]:
+    # "customer" also matches "customers"; "category" also matches "categories"
+    out = [phrase, phrase + "s"]
+    if phrase.endswith("y"):
+        out.append(phrase[:-1] + "ies")
+    return out
+
+
+def table_phrases() -> Dict[str, str]:
+    # "order details", "category", "categories", ... -> table
+    mapping: Dict[str, str] = {}
+    for table in SCHEMA_TABLES:
+        name = table.replace("_", " ")
+        singular = name[:-3] + "y" if name.endswith("ies") else name[:-1] if name.endswith("s") else name
+        for variant in {name, *_variants(singular)}:
+            mapping[variant] = table
+    return mapping
+
+
+def phrase_tables(dictionary: Dict[str, Any]) -> Dict[str, Set[str]]:
+    '''
+    phrase -> tables it points at. A table's own name points only at that table
+    ("supplier" is also a products column synonym); column names, the
+    DATA_DICTIONARY column synonyms and the business wording above may point at several.
+    '''
+    mapping: Dict[str, Set[str]] = {}
+
+    def add(phrase: str, table: str) -> None:
+        for variant in _variants(phrase.lower()):
+            mapping.setdefault(variant, set()).add(table)
+
+    for table, info in (dictionary.get("tables") or {}).items():
+        for column, col_info in (info.get("columns") or {}).items():
+            add(column, table)
+            add(re.sub(r"(?<=[a-z])(?=[A-Z])", " ", column), table)
+            for phrase in col_info.get("synonyms", []):
+                add(phrase, table)
+    for phrase, tables in _TERM_TABLES.items():
+        for variant in _variants(phrase):
+            mapping[variant] = set(tables)
+    for phrase, table in table_phrases().items():
+        mapping[phrase] = {table}
+    return mapping
+
+
+def fk_graph() -> Dict[str, Set[str]]:
+    graph: Dict[str, Set[str]] = {t: set() for t in SCHEMA_TABLES}
+    for table, _, ref_table, _ in FOREIGN_KEYS:
+        if table != ref_table:
+            graph[table].add(ref_table)
+            graph[ref_table].add(table)
+    return graph
+
+
+def _shortest_path(graph: Dict[str, Set[str]], sources: Set[str], target: str) -> List[str]:
+    '''
+    Tables on the shortest FK path from any of sources to target (target included).
+    '''
+    previous: Dict[str, Optional[str]] = {s: None for s in sources}
+    queue = deque(sorted(sources))
+    while queue:
+        table = queue.popleft()
+        if table == target:
+            path = []
+            while table is not None and table not in sources:
+                path.append(table)
+                table = previous[table]
+            return path
+        for neighbour in sorted(graph[table]):
+            if neighbour not in previous:
+                previous[neighbour] = table
+                queue.append(neighbour)
+    return [target]
+
+
+class SchemaRetriever:
+    '''
+    Picks the tables a question needs.
+
+    Phrases from the data dictionary (table names, columns, synonyms) are matched
+    longest first. Phrases that point at a single table select it. Ambiguous ones
+    ("country") are covered by an already selected table or add the most central
+    candidate. Years select orders; association tables bring the tables they link.
+    The selection is then connected through the shortest foreign-key paths, so
+    the join tables are always included ("products by customer" adds
+    order_details and orders).
+
+    retrieve() returns None when nothing matched, i.e. "use the full schema".
+    '''
+
+    def __init__(self, dictionary: Optional[Dict[str, Any]] = None):
+        self.dictionary = dictionary if dictionary is not None else DATA_DICTIONARY
+        self.phrases = phrase_tables(self.dictionary)
+        ordered = sorted(self.phrases, key=len, reverse=True)
+        self._pattern = re.compile(r"\b(" + "|".join(re.escape(p) for p in ordered) + r")\b")
+        self.graph = fk_graph()
+
+    def matches(self, question: str) -> List[Set[str]]:
+        text = re.sub(r"[^\w\s]", " ", (question or "").lower())
+        return [self.phrases[m.group(1)] for m in self._pattern.finditer(text)]
+
+    def retrieve(self, question: str) -> Optional[List[str]]:
+        matches = self.matches(question)
+        if not matches:
+            return None
+
+        selected: Set[str] = set()
+        for tables in matches:
+            if len(tables) == 1:
+                selected |= tables
+        for tables in matches:
+            if len(tables) > 1 and not tables & selected:
+                selected.add(min(tables, key=_CENTRALITY.index))
+        if _YEAR.search(question):
+            selected.add("orders")
+        for table in list(selected):
+            selected.update(_COMPANIONS.get(table, ()))
+
+        connected = {min(selected, key=_CENTRALITY.index)}
+        for table in sorted(selected, key=_CENTRALITY.index):
+            if table not in connected:
+                connected.update(_shortest_path(self.graph, connected, table))
+        return [t for t in SCHEMA_TABLES if t in connected]
+
+
+_default_retriever: Optional[SchemaRetriever] = None
+
+
+def retrieve_tables(question: str) -> Optional[List[str]]:
+    '''
+    Tables for the NL->SQL prompt, or None for the full schema.
+    SCHEMA_PRUNING=0 always sends the full schema.
+    '''
+    global _default_retriever
+    if os.getenv("SCHEMA_PRUNING", "1") == "0":
+        return None
+    if _default_retriever is None:
+        _default_retriever = SchemaRetriever()
+    return _default_retriever.retrieve(question)
@@ -0,0 +1,340 @@
+import atexit
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.metadata.data_dictionary import DATA_DICTIONARY
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[2] / ".cache" / "semantic_sql_cache.json"
+
+_STOPWORDS = frozenset({
+    "a", "an", "the", "of", "by", "for", "in", "on", "to", "and", "with", "from", "at",
+    "me", "show", "list", "give", "get", "find", "display", "tell", "please", "can", "you",
+    "what", "which", "who", "whose", "is", "are", "was", "were", "be", "been", "have", "has",
+    "do", "does", "did", "there", "their", "our", "we", "i", "all", "each", "per", "that",
+})
+
+# Analytics wording that the data dictionary does not cover.
+_GENERAL_SYNONYMS = {
+    "top": ["biggest", "largest", "best", "highest", "most", "leading", "greatest"],
+    "bottom": ["smallest", "lowest", "least", "worst"],
+    "revenue": ["sales", "turnover", "income", "earnings"],
+    "customers": ["clients", "client", "buyers", "customer"],
+    "count": ["how many", "number of", "count of", "total number of"],
+    "average": ["avg", "mean"],
+}
+
+_NUMBER_WORDS = {
+    "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6",
+    "seven": "7", "eight": "8", "nine": "9", "ten": "10", "twenty": "20",
+}
+
+
+def schema_fingerprint(schema: Any) -> str:
+    return hashlib.sha256(json.dumps(schema, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def synonym_map(dictionary: Dict[str, Any]) -> Dict[str, str]:
+    '''
+    phrase -> canonical token, from the DATA_DICTIONARY column synonyms
+    ("client id" -> "customerid") plus the general analytics wording above.
+    '''
+    mapping: Dict[str, str] = {}
+    for table, info in (dictionary.get("tables") or {}).items():
+        mapping[table.replace("_", " ")] = table
+        for column, col_info in (info.get("columns") or {}).items():
+            canonical = column.lower()
+            mapping[column.lower()] = canonical
+            for phrase in col_info.get("synonyms", []):
+                mapping.setdefault(phrase.lower(), canonical)
+    for canonical, phrases in _GENERAL_SYNONYMS.items():
+        for phrase in phrases:
+            mapping[phrase] = canonical
+    return mapping
+
+
+class QuestionNormalizer:
+    def __init__(self, dictionary: Dict[str, Any]):
+        self.synonyms = synonym_map(dictionary)
+        # longest phrases first so "customer name" wins over "customer"
+        phrases = sorted(self.synonyms, key=len, reverse=True)
+        self._pattern = re.compile(r"\b(" + "|".join(re.escape(p) for p in phrases) + r")\b")
+        self.vocabulary = set(self.synonyms.values()) | set(_STOPWORDS)
+
+    def tokens(self, question: str) -> List[str]:
+        text = (question or "").lower()
+        text = re.sub(r"[^\w\s'.-]", " ", text)
+        text = " ".join(_NUMBER_WORDS.get(w, w) for w in text.split())
+        text = self._pattern.sub(lambda m: " " + self.synonyms[m.group(1)] + " ", text)
+        out = []
+        for word in re.findall(r"[\w'.-]+", text):
+            word = word.strip("'.-")
+            if not word or word in _STOPWORDS:
+                continue
+            if len(word) > 3 and word.endswith("s") and word[:-1] in self.vocabulary:
+                word = word[:-1]
+            out.append(word)
+        return out
+
+    def normalize(self, question: str) -> str:
+        return " ".join(sorted(self.tokens(question)))
+
+    def literals(self, tokens: List[str]) -> Set[str]:
+        '''
+        Numbers and words outside the known vocabulary ("germany", "1997"): these
+        change the answer, so two questions only match if they agree on all of them.
+        '''
+        return {t for t in tokens if t not in self.vocabulary}
+
+
+def _grams(normalized: str) -> Counter:
+    # bag of words (word order rarely changes the SQL: "5 biggest" / "top 5")
+    # plus per-word character trigrams for typos and inflections
+    grams = Counter()
+    for word in normalized.split():
+        grams[word] += 2
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _cosine(a: Counter, b: Counter, norm_a: float, norm_b: float) -> float:
+    if not norm_a or not norm_b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0) for k, v in a.items()) / (norm_a * norm_b)
+
+
+class SemanticSQLCache:
+    '''
+    Question -> SQL cache for SQL that is known to execute.
+
+    Questions are normalized (lowercase, number words, DATA_DICTIONARY synonyms
+    mapped to column / table names, stopwords dropped) and indexed as word and
+    character-trigram vectors. A lookup returns the SQL of the most
+    similar cached question if the cosine similarity is >= threshold and both
+    questions mention the same literals (numbers, names, countries ...).
+
+    Entries are tied to a fingerprint of the data dictionary (checked when the
+    file is loaded) and of the live database schema passed to set_schema() at
+    startup; a change in either drops them. With a path, entries persist as JSON
+    across restarts. Writes are batched: the file is rewritten by a timer thread
+    save_delay_s after the first change, never on the caller's thread.
+    '''
+
+    def __init__(
+        self,
+        dictionary: Optional[Dict[str, Any]] = None,
+        threshold: float = 0.9,
+        max_entries: int = 2000,
+        path: Optional[Path] = None,
+        save_delay_s: float = 2.0,
+    ):
+        self.dictionary = dictionary if dictionary is not None else DATA_DICTIONARY
+        self.normalizer = QuestionNormalizer(self.dictionary)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.path = Path(path) if path else None
+        self.save_delay_s = save_delay_s
+        self.schema_version = schema_fingerprint(self.dictionary)
+        self.live_schema_version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        self._entries: Dict[str, Dict[str, Any]] = {}  # normalized question -> entry
+        self._vectors: Dict[str, Tuple[Counter, float]] = {}
+        self._index: Dict[str, Set[str]] = {}  # word -> normalized questions containing it
+        self._load()
+
+    def _add(self, normalized: str, entry: Dict[str, Any]) -> None:
+        grams = _grams(normalized)
+        self._entries[normalized] = entry
+        self._vectors[normalized] = (grams, math.sqrt(sum(v * v for v in grams.values())))
+        for word in set(normalized.split()):
+            self._index.setdefault(word, set()).add(normalized)
+
+    def _remove(self, normalized: str) -> None:
+        self._entries.pop(normalized, None)
+        self._vectors.pop(normalized, None)
+        for word in set(normalized.split()):
+            bucket = self._index.get(word)
+            if bucket is not None:
+                bucket.discard(normalized)
+                if not bucket:
+                    del self._index[word]
+
+    def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        '''
+        {"sql", "question", "similarity"} of the best match, or None.
+        '''
+        tokens = self.normalizer.tokens(question)
+        normalized = " ".join(sorted(tokens))
+        if not normalized:
+            return None
+        literals = self.normalizer.literals(tokens)
+        grams = _grams(normalized)
+        norm = math.sqrt(sum(v * v for v in grams.values()))
+
+        with self._lock:
+            candidates = set()
+            for word in set(tokens):
+                candidates |= self._index.get(word, set())
+            best, best_score = None, 0.0
+            for cand in candidates:
+                entry = self._entries[cand]
+                if set(entry["literals"]) != literals:
+                    continue
+                cand_grams, cand_norm = self._vectors[cand]
+                score = _cosine(grams, cand_grams, norm, cand_norm)
+                if score > best_score:
+                    best, best_score = cand, score
+
+            if best is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+            entry = self._entries[best]
+            entry["hits"] += 1
+            entry["last_used"] = time.time()
+            self.hits += 1
+            return {"sql": entry["sql"], "question": entry["question"], "similarity": round(best_score, 4)}
+
+    def put(self, question: str, sql: str) -> None:
+        tokens = self.normalizer.tokens(question)
+        normalized = " ".join(sorted(tokens))
+        if not normalized or not sql:
+            return
+        entry = {
+            "question": question,
+            "sql": sql,
+            "literals": sorted(self.normalizer.literals(tokens)),
+            "hits": 0,
+            "created": time.time(),
+            "last_used": time.time(),
+        }
+        with self._lock:
+            current = self._entries.get(normalized)
+            if current is not None and current["sql"] == sql:
+                current["last_used"] = entry["last_used"]
+                return
+            self._remove(normalized)
+            self._add(normalized, entry)
+            while len(self._entries) > self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k]["last_used"])
+                self._remove(oldest)
+            self._schedule_save()
+
+    def discard(self, question: str) -> None:
+        '''
+        Drop the entry for a question whose cached SQL no longer executes.
+        '''
+        with self._lock:
+            self._remove(self.normalizer.normalize(question))
+            self._schedule_save()
+
+    def set_schema(self, schema: Any) -> None:
+        '''
+        Call with the live database schema (SupabaseDBToolAsync.fetch_schema());
+        cached SQL is dropped if it changed since the entries were written. The
+        first schema seen by a cache file is adopted as is.
+        '''
+        version = schema_fingerprint(schema)
+        if version == self.live_schema_version:
+            return
+        if self.live_schema_version is not None:
+            self.invalidate()
+        with self._lock:
+            self.live_schema_version = version
+            self._schedule_save()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+            self._index.clear()
+            self.invalidations += 1
+            self._schedule_save()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+            "threshold": self.threshold,
+            "schema_version": self.schema_version,
+            "live_schema_version": self.live_schema_version,
+        }
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except ValueError:
+            return
+        if data.get("schema_version") != self.schema_version:
+            return  # stale: schema changed since the file was written
+        self.live_schema_version = data.get("live_schema_version")
+        for normalized, entry in data.get("entries", {}).items():
+            self._add(normalized, entry)
+
+    def _schedule_save(self) -> None:
+        # caller holds self._lock; later changes ride along with the pending write
+        if self.path is None or self._save_timer is not None:
+            return
+        self._save_timer = threading.Timer(self.save_delay_s, self.flush)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def flush(self) -> None:
+        '''
+        Write pending changes now (the timer does this save_delay_s after the first one).
+        '''
+        with self._write_lock:
+            with self._lock:
+                timer, self._save_timer = self._save_timer, None
+                if timer is None:
+                    return
+                timer.cancel()
+                data = {
+                    "schema_version": self.schema_version,
+                    "live_schema_version": self.live_schema_version,
+                    "entries": {k: dict(v) for k, v in self._entries.items()},
+                }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+
+_default_cache: Optional[SemanticSQLCache] = None
+
+
+def get_semantic_cache() -> Optional[SemanticSQLCache]:
+    '''
+    Process-wide cache used by the graph nodes. SEMANTIC_CACHE=0 disables it;
+    SEMANTIC_CACHE_THRESHOLD and SEMANTIC_CACHE_PATH override the defaults.
+    '''
+    global _default_cache
+    if os.getenv("SEMANTIC_CACHE", "1") == "0":
+        return None
+    if _default_cache is None:
+        _default_cache = SemanticSQLCache(
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+            path=Path(os.getenv("SEMANTIC_CACHE_PATH") or DEFAULT_CACHE_PATH),
+        )
+        atexit.register(_default_cache.flush)
+    return _default_cache
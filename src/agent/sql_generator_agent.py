@@ -1,9 +1,9 @@
-from langchain_community.chat_models import ChatOpenAI
 from langchain_core.messages import SystemMessage
-from src.agent.prompts import NLQ_TO_SQL_PROMPT
-from src.config import OPENAI_API_KEY
+from src.agent.prompts import NLQ_TO_SQL_PROMPT, build_nlq_prompt
+from src.agent.schema_retriever import retrieve_tables
+from src.agent.llm_clients import get_chat_model
 
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, openai_api_key=OPENAI_API_KEY)
+llm = get_chat_model("gpt-4o-mini", temperature=0)
 
 
 def _clean_sql_output(sql: str) -> str:
@@ -29,6 +29,13 @@ def _clean_sql_output(sql: str) -> str:
     return sql.strip()
 
 
+def _sql_prompt(user_question: str) -> SystemMessage:
+    # only the tables (and join paths) the question needs; full schema if none matched
+    tables = retrieve_tables(user_question)
+    template = build_nlq_prompt(tables) if tables else NLQ_TO_SQL_PROMPT
+    return SystemMessage(content=template.replace("{user_question}", user_question))
+
+
 def generate_sql_from_nl(user_question: str) -> str:
     """
     Generates SQL query from natural language question.
@@ -39,9 +46,7 @@ def generate_sql_from_nl(user_question: str) -> str:
     Returns:
         str: Cleaned SQL query
     """
-    formatted_prompt = NLQ_TO_SQL_PROMPT.replace("{user_question}", user_question)
-    
-    system_instruction = SystemMessage(content=formatted_prompt)
+    system_instruction = _sql_prompt(user_question)
     
     try:
         response = llm.invoke([system_instruction])
@@ -52,3 +57,14 @@ def generate_sql_from_nl(user_question: str) -> str:
         
     except Exception as e:
         return f"Error: {str(e)}"
+
+
+async def agenerate_sql_from_nl(user_question: str) -> str:
+    """
+    Async generate_sql_from_nl (same prompt, cleaning and error string).
+    """
+    try:
+        response = await llm.ainvoke([_sql_prompt(user_question)])
+        return _clean_sql_output(response.content)
+    except Exception as e:
+        return f"Error: {str(e)}"
@@ -1,29 +1,22 @@
-from langchain_community.chat_models import ChatOpenAI
+from functools import lru_cache
+from typing import Tuple
 from langchain_core.messages import SystemMessage
-from src.config import OPENAI_API_KEY
+from src.agent.llm_clients import get_chat_model
 from src.agent.prompts import REPAIR_SYSTEM_PROMPT
-import json
+from src.agent.repair_context import build_repair_context, dictionary_section
+from src.metadata.data_dictionary import DATA_DICTIONARY
 from langchain.prompts import ChatPromptTemplate
 
 from langchain_core.output_parsers import JsonOutputParser
 
 
-def repair_reasoning_engine(intent: str, sql: str, error_info: dict, dictionary: dict):
-    """
-    Analyzes SQL errors by cross-referencing the failed query with the 
-    provided Data Dictionary.
-    """
-
-    llm = ChatOpenAI(
-        model="gpt-4o-mini", 
-        temperature=0,
-        model_kwargs={"response_format": {"type": "json_object"}} 
-    )
+def _build_repair_chain(dictionary_text: str):
+    llm = get_chat_model("gpt-4o-mini", temperature=0, json_mode=True)
 
     system_instructions = (
         "You are a technical SQL Repair Agent. You must output ONLY a valid JSON object. "
         "Do not include any conversational text, markdown blocks, or explanations outside the JSON structure.\n\n"
-        "DATA DICTIONARY:\n{dictionary_json}\n\n"
+        "DATA DICTIONARY:\n" + dictionary_text.replace("{", "{{").replace("}", "}}") + "\n\n"
         "RESPONSE FORMAT:\n"
         "{{\n"
         '  "action": "REPAIR" | "CLARIFY" | "FAIL",\n'
@@ -41,11 +34,48 @@ def repair_reasoning_engine(intent: str, sql: str, error_info: dict, dictionary:
         ("human", "Intent: {intent}\nSQL: {sql}\nError: {error}")
     ])
 
-    chain = prompt | llm | JsonOutputParser()
+    return prompt | llm | JsonOutputParser()
 
-    return chain.invoke({
-        "dictionary_json": json.dumps(dictionary, indent=2),
+
+@lru_cache(maxsize=128)
+def _cached_repair_chain(tables: Tuple[str, ...]):
+    return _build_repair_chain(dictionary_section(tables))
+
+
+def _repair_chain(tables: Tuple[str, ...], dictionary: dict):
+    # one prebuilt prompt + chain per table set for the shared DATA_DICTIONARY
+    if dictionary is DATA_DICTIONARY:
+        return _cached_repair_chain(tables)
+    return _build_repair_chain(dictionary_section(tables, dictionary))
+
+
+def _repair_request(intent: str, sql: str, error_info: dict, dictionary: dict):
+    """
+    Chain and inputs for one repair: only the dictionary entries of the tables the
+    failed SQL uses (plus what the error's identifier most likely meant),
+    and an error line with SQLSTATE and the closest real column / table names.
+    """
+    context = build_repair_context(sql, error_info, dictionary)
+    inputs = {
         "intent": intent,
         "sql": sql,
-        "error": error_info.get("message")
-    })
\ No newline at end of file
+        "error": context.error_text(error_info),
+    }
+    return _repair_chain(context.tables, dictionary), inputs
+
+
+def repair_reasoning_engine(intent: str, sql: str, error_info: dict, dictionary: dict):
+    """
+    Analyzes SQL errors by cross-referencing the failed query with the 
+    provided Data Dictionary.
+    """
+    chain, inputs = _repair_request(intent, sql, error_info, dictionary)
+    return chain.invoke(inputs)
+
+
+async def arepair_reasoning_engine(intent: str, sql: str, error_info: dict, dictionary: dict):
+    """
+    Async repair_reasoning_engine (chain.ainvoke).
+    """
+    chain, inputs = _repair_request(intent, sql, error_info, dictionary)
+    return await chain.ainvoke(inputs)
@@ -1,15 +1,28 @@
+import asyncio
+import csv
+import io
 import os
-from fastapi import FastAPI
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from src.database.db_tool import SupabaseDBToolAsync, DBToolConfig
+from src.database.db_tool import SupabaseDBToolAsync, DBToolConfig, DBToolError
+from src.database.result_cache import TTLLRUResultCache
+from src.database.columnar import envelope_columnar
+from src.database.result_handles import ResultHandleStore, decode_cursor
+from src.api.responses import EnvelopeJSONResponse
+from src.config import DATABASE_URL
+from src.agent.llm_cache import install_llm_cache
+from src.agent.llm_clients import get_llm_registry
+from src.agent.semantic_cache import get_semantic_cache
 from src.app_graph.workflow import build_querymate_workflow
 from langchain_core.messages import HumanMessage
 from fastapi.middleware.cors import CORSMiddleware
 
 load_dotenv()
 
-app = FastAPI()
+app = FastAPI(default_response_class=EnvelopeJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,28 +35,76 @@ app.add_middleware(
 class ChatRequest(BaseModel):
     message: str
     thread_id: str = "default"
+    explain: bool = False
+    # fast preview on sampled data; upgrade with POST /results/{result_id}/exact
+    approximate: bool = False
 
 @app.on_event("startup")
 async def startup_event():
-    db_url = os.getenv("SUPABASE_DB_URL")
+    db_url = DATABASE_URL
     if not db_url:
-        raise ValueError("SUPABASE_DB_URL not set in environment")
+        raise ValueError("SUPABASE_DB_URL (or QUERYMATE_DB_URL) not set in environment")
 
-    cfg = DBToolConfig(database_url=db_url, max_repairs=3)
-    db_tool = SupabaseDBToolAsync(cfg)
+    replica_urls = tuple(u.strip() for u in os.getenv("SUPABASE_REPLICA_URLS", "").split(",") if u.strip())
+
+    cfg = DBToolConfig(
+        database_url=db_url,
+        max_repairs=3,
+        result_format="columnar",
+        # EXPLAIN admission gate: one extra round trip per query, so opt-in
+        cost_gate_action=os.getenv("COST_GATE_ACTION", "off"),
+        replica_urls=replica_urls,
+    )
+    db_tool = SupabaseDBToolAsync(cfg, result_cache=TTLLRUResultCache())
 
     await db_tool.start()
 
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        # drops cached question -> SQL pairs if the database schema changed since they were written
+        semantic_cache.set_schema(await db_tool.fetch_schema())
+
     app.state.db_tool = db_tool
     app.state.graph = build_querymate_workflow(db_tool)
+    app.state.last_sql = {}
+    app.state.result_handles = ResultHandleStore()
+    app.state.llm_cache = install_llm_cache()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     await app.state.db_tool.close()
+    await get_llm_registry().aclose()
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        semantic_cache.flush()
+
+async def run_until_disconnect(request: Request, coro, poll_s: float = 0.5):
+    '''
+    Runs `coro` as a task and cancels it as soon as the HTTP client disconnects.
+    Cancellation reaches the DB tool, which cancels the running PostgreSQL statement.
+    Returns (finished, result).
+    '''
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_s)
+            if done:
+                return True, task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                return False, None
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
 
 @app.post("/chat")
-async def chat(req: ChatRequest):
+async def chat(req: ChatRequest, request: Request):
     graph = app.state.graph
 
     initial_state = {
@@ -55,11 +116,14 @@ async def chat(req: ChatRequest):
         "viz_code": None,
         "viz_plan": None,
         "columns": [],
+        "column_meta": [],
         "sample_rows": [],
         "needs_clarification": False,
         "is_unsupported": False,
         "feedback_reason": None,
         "last_error": None,
+        "explain": req.explain,
+        "approximate": req.approximate,
     }
 
     config = {
@@ -67,16 +131,179 @@ async def chat(req: ChatRequest):
         "recursion_limit": 40
     }
 
-    result = await graph.ainvoke(initial_state, config=config)
+    finished, result = await run_until_disconnect(request, graph.ainvoke(initial_state, config=config))
+    if not finished:
+        # 499: client closed request (nobody is listening anymore)
+        return Response(status_code=499)
 
 
     final_msg = result["messages"][-1].content
 
-    return {
+    if result.get("sql_query") and (result.get("db_result") or {}).get("ok"):
+        app.state.last_sql[req.thread_id] = result["sql_query"]
+
+    db_result = result.get("db_result") or {}
+    sample_data = envelope_columnar(db_result, limit=20) if db_result.get("ok") else None
+    result_id = None
+    if db_result.get("ok") and result.get("sql_query"):
+        result_id = app.state.result_handles.create(
+            result["sql_query"], result.get("columns"), result.get("column_meta")
+        )
+
+    return EnvelopeJSONResponse({
         "reply": final_msg,
         "sql_query": result.get("sql_query"),
         "viz_code": result.get("viz_code"),
         "columns": result.get("columns"),
+        "column_meta": result.get("column_meta"),
         "sample_rows": result.get("sample_rows"),
+        "sample_data": sample_data,
         "error": result.get("last_error"),
-    }
+        "explain_id": (db_result.get("meta") or {}).get("explain_id"),
+        "result_id": result_id,
+        "approximate": (db_result.get("meta") or {}).get("approximate"),
+    })
+
+
+@app.get("/results/{result_id}")
+async def get_results_page(result_id: str, cursor: Optional[str] = None, page_size: int = 100):
+    '''
+    Pages through the full result of a /chat answer. Pass the returned next_cursor
+    to get the following page; next_cursor is null on the last page.
+    '''
+    handle = app.state.result_handles.get(result_id)
+    if handle is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired result id.")
+    try:
+        position = decode_cursor(cursor)
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Malformed cursor.")
+
+    page = await app.state.db_tool.fetch_page(
+        handle.sql, position, max(1, min(page_size, 1000)), column_meta=handle.column_meta
+    )
+    if not page.get("ok"):
+        raise HTTPException(status_code=400, detail=page.get("error"))
+
+    return EnvelopeJSONResponse({
+        "result_id": result_id,
+        "data": page["data"],
+        "next_cursor": page["meta"].get("next_cursor"),
+    })
+
+
+@app.post("/results/{result_id}/exact")
+async def get_exact_result(result_id: str):
+    '''
+    Re-runs an approximate /chat answer without sampling.
+    '''
+    handle = app.state.result_handles.get(result_id)
+    if handle is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired result id.")
+
+    result = await app.state.db_tool.run_sql(handle.sql)
+    if not result.get("ok"):
+        raise HTTPException(status_code=400, detail=result.get("error"))
+
+    data = result.get("data") or {}
+    return EnvelopeJSONResponse({
+        "result_id": result_id,
+        "columns": data.get("columns"),
+        "column_meta": data.get("column_meta"),
+        "row_count": data.get("row_count"),
+        "sample_data": envelope_columnar(result, limit=20),
+        "approximate": None,
+    })
+
+
+@app.get("/explain/{explain_id}")
+async def get_explain(explain_id: str):
+    '''
+    Plans are captured in the background after /chat returns, so poll until ready.
+    '''
+    plan = app.state.db_tool.get_explain_plan(explain_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not captured (yet).")
+    return {"explain_id": explain_id, "plan": plan}
+
+
+
+@app.get("/export/{thread_id}")
+async def export_csv(thread_id: str):
+    """
+    Streams the full result of the thread's last successful query as CSV.
+    Rows come from a server-side cursor, so nothing is capped at max_rows.
+    """
+    sql = app.state.last_sql.get(thread_id)
+    if not sql:
+        raise HTTPException(status_code=404, detail="No successful query for this thread.")
+
+    batches = app.state.db_tool.stream_sql(sql)
+    try:
+        first = await batches.__anext__()
+    except StopAsyncIteration:
+        first = []
+    except DBToolError as e:
+        raise HTTPException(status_code=400, detail=e.envelope["error"])
+
+    async def body():
+        buf = io.StringIO()
+        writer = None
+        batch = first
+        while True:
+            if batch:
+                if writer is None:
+                    writer = csv.DictWriter(buf, fieldnames=list(batch[0].keys()))
+                    writer.writeheader()
+                writer.writerows(batch)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            try:
+                batch = await batches.__anext__()
+            except StopAsyncIteration:
+                return
+
+    return StreamingResponse(
+        body(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="querymate_{thread_id}.csv"'},
+    )
+
+
+
+@app.get("/stats/pool")
+async def pool_stats():
+    """
+    Connection pool metrics: acquire latency, in-use / idle connections, queue depth, shed requests.
+    """
+    return app.state.db_tool.pool_metrics()
+
+
+@app.get("/stats/llm_cache")
+async def llm_cache_stats():
+    """
+    Disk LLM cache: entries, bytes, hit rate, evictions.
+    """
+    cache = app.state.llm_cache
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+@app.get("/stats/llm_clients")
+async def llm_client_stats():
+    """
+    Pooled chat clients and the RPM/TPM scheduler: calls, throttled calls, total wait, tokens used.
+    """
+    return get_llm_registry().stats()
+
+
+@app.get("/stats/queries")
+async def query_stats(order_by: str = "total_ms", limit: int = 20):
+    """
+    Per-fingerprint query statistics (literals stripped): calls, total / mean / p95 time,
+    rows, errors, cache hits. order_by: total_ms | mean_ms | p95_ms | calls | errors | rows.
+    """
+    if order_by not in ("total_ms", "mean_ms", "p95_ms", "max_ms", "calls", "errors", "rows", "cache_hits"):
+        raise HTTPException(status_code=400, detail=f"Cannot order by {order_by!r}.")
+    stats = app.state.db_tool.query_stats
+    return {**stats.summary(), "queries": stats.top(order_by, max(1, min(limit, 500)))}
@@ -0,0 +1,17 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from src.database.serialization import dumps
+
+
+class EnvelopeJSONResponse(JSONResponse):
+    '''
+    JSONResponse that encodes DB envelopes (Decimal, date, asyncpg Record) directly.
+
+    Return an instance from the endpoint: a plain dict would still go through
+    FastAPI's jsonable_encoder first.
+    '''
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
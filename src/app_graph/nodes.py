@@ -1,24 +1,27 @@
 import os
-from langchain_openai import ChatOpenAI
+from decimal import Decimal
+from typing import Optional, Tuple
 from langchain_core.messages import SystemMessage, HumanMessage
 
-from src.agent.controller import run_master_agent
-from src.agent.sql_generator_agent import generate_sql_from_nl
+from src.agent.controller import arun_master_agent, run_master_agent
+from src.agent.sql_generator_agent import agenerate_sql_from_nl, generate_sql_from_nl
 
 from src.agent.prompts import VISUALIZATION_PLANNER_PROMPT,  VISUALIZATION_CODE_PROMPT
-from src.config import OPENAI_API_KEY
 
 from langchain_core.messages import AIMessage
 from .state import AgentState
 from src.metadata.data_dictionary import DATA_DICTIONARY
-from src.agent.sql_validator_agent import repair_reasoning_engine
+from src.agent.sql_validator_agent import arepair_reasoning_engine, repair_reasoning_engine
+from src.agent.semantic_cache import get_semantic_cache
+from src.agent.llm_clients import ScheduledChatOpenAI, get_chat_model
 from src.database.db_tool import SupabaseDBToolAsync
-from src.database.extract_db_result_preview import _extract_columns_and_sample_rows
+from src.database.extract_db_result_preview import _extract_columns_and_sample_rows, _extract_column_meta
+from src.database.columnar import envelope_rows
 
 
-def orchestrator_node(state: AgentState) -> dict:
+def _orchestrator_shortcut(state: AgentState) -> Optional[dict]:
     """
-    The Orchestrator: Controls the flow based on Repair Agent feedback.
+    Decisions the orchestrator makes without the LLM (None: ask the master agent).
     """
 
     if (state.get("db_result") or {}).get("ok") and state.get("viz_code"):
@@ -41,6 +44,8 @@ def orchestrator_node(state: AgentState) -> dict:
       
         if "DELETE" in reason.upper() or "DROP" in reason.upper():
             user_msg = "I'm sorry, but for security reasons, I can only analyze data, not delete or modify it."
+        elif reason.startswith("OVERLOADED"):
+            user_msg = "The database is busy right now. Please try again in a moment."
         elif "Max repair attempts" in reason:
             user_msg = "I apologize, I've run into a technical issue while processing this request and couldn't resolve it after several attempts."
         else:
@@ -52,12 +57,11 @@ def orchestrator_node(state: AgentState) -> dict:
             "next_step": "end", 
             "is_unsupported": False 
         }
-  
+    return None
+
 
-    response = run_master_agent(state["messages"])
+def _orchestrator_route(response) -> dict:
     content = response.content.strip()
-    
-   
 
     if "[TRIGGER_SQL]" in content: 
         next_step = "sql_generator"
@@ -68,31 +72,99 @@ def orchestrator_node(state: AgentState) -> dict:
         "messages": [response],
         "next_step": next_step
     }
+
+
+def orchestrator_node(state: AgentState) -> dict:
+    """
+    The Orchestrator: Controls the flow based on Repair Agent feedback.
+    """
+    shortcut = _orchestrator_shortcut(state)
+    if shortcut is not None:
+        return shortcut
+    return _orchestrator_route(run_master_agent(state["messages"]))
+
+
+async def aorchestrator_node(state: AgentState) -> dict:
+    shortcut = _orchestrator_shortcut(state)
+    if shortcut is not None:
+        return shortcut
+    return _orchestrator_route(await arun_master_agent(state["messages"]))
    
    
 
 
 
+def _latest_question(state: AgentState) -> str:
+    for message in reversed(state.get("messages") or []):
+        if isinstance(message, HumanMessage):
+            return message.content
+    return ""
+
+
+def _sql_request(state: AgentState) -> str:
+    # the orchestrator's standalone rewrite of the turn ("what about 1998?" ->
+    # "[TRIGGER_SQL] revenue by month in 1998"); the SQL is generated from it
+    return state["messages"][-1].content
+
+
+def _cache_key(request: str) -> str:
+    # the semantic cache is process-wide: key it on the contextualized request,
+    # never on the raw follow-up turn, which means different things in different threads
+    return request.replace("[TRIGGER_SQL]", "").strip()
+
+
+def _cached_sql(question: str, cache_key: str) -> Optional[dict]:
+    cache = get_semantic_cache()
+    hit = cache.lookup(cache_key) if cache is not None and cache_key else None
+    if hit is None:
+        return None
+    return {
+        "sql_query": hit["sql"],
+        "question": question,
+        "sql_cache_key": cache_key,
+        "sql_cache_hit": True,
+        "next_step": "db_execute"
+    }
+
+
+def _generated_sql(question: str, cache_key: str, sql_query: str) -> dict:
+    return {
+        "sql_query": (sql_query or "").strip().rstrip(";"),
+        "question": question,
+        "sql_cache_key": cache_key,
+        "sql_cache_hit": False,
+        "next_step": "db_execute"
+    }
+
+
 def sql_generator_node(state: AgentState) -> dict:
     """
     SQL Generator Node:
     Takes the latest user question and generates SQL.
+    Near-duplicates of questions answered before reuse their SQL from the semantic cache.
     """
-    user_message = state["messages"][-1].content
+    question, request = _latest_question(state), _sql_request(state)
+    cached = _cached_sql(question, _cache_key(request))
+    if cached is not None:
+        return cached
+    return _generated_sql(question, _cache_key(request), generate_sql_from_nl(request))
 
-    sql_query = generate_sql_from_nl(user_message)
-    sql_query = (sql_query or "").strip().rstrip(";")
 
-    return {
-        "sql_query": sql_query,
-        "next_step": "db_execute"
-    }
+async def asql_generator_node(state: AgentState) -> dict:
+    question, request = _latest_question(state), _sql_request(state)
+    cached = _cached_sql(question, _cache_key(request))
+    if cached is not None:
+        return cached
+    return _generated_sql(question, _cache_key(request), await agenerate_sql_from_nl(request))
 
 
-def visualization_planner_node(state: AgentState) -> dict:
+def _viz_llm() -> ScheduledChatOpenAI:
+    return get_chat_model(os.getenv("OPENAI_MODEL", "gpt-4o-mini"), temperature=0)
+
+
+def _viz_planner_request(state: AgentState) -> Tuple[Optional[dict], list, dict]:
     """
-    Generates a visualization plan using VISUALIZATION_PLANNER_PROMPT.
-    Reads query results from DB Tool output: state["db_result"].
+    (early result, LLM messages, result fields) for the visualization planner.
     """
 
     question = state.get("question", "") or ""
@@ -113,7 +185,7 @@ def visualization_planner_node(state: AgentState) -> dict:
     if not db_result:
         return {
             "viz_plan": "NO_VIZ\nreason: db_result missing (DB tool did not run).",
-        } 
+        }, [], {}
 
     if not db_result.get("ok"):
         err = db_result.get("error") or {}
@@ -124,12 +196,11 @@ def visualization_planner_node(state: AgentState) -> dict:
                 f"error_type: {err.get('type')}\n"
                 f"message: {err.get('message')}"
             )
-        }
+        }, [], {}
 
     columns, sample_rows = _extract_columns_and_sample_rows(db_result, max_sample=10)
-
-    model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    llm = ChatOpenAI(model=model_name, temperature=0, openai_api_key=OPENAI_API_KEY)
+    column_meta = _extract_column_meta(db_result)
+    column_types = [f'{c["name"]}: {c["type"]} ({c["category"]})' for c in column_meta]
 
     system = SystemMessage(content=VISUALIZATION_PLANNER_PROMPT)
 
@@ -139,6 +210,7 @@ def visualization_planner_node(state: AgentState) -> dict:
         f"User question:\n{question}\n\n"
         f"SQL query:\n{sql_query}\n\n"
         f"Result columns:\n{columns}\n\n"
+        f"Column types:\n{column_types}\n\n"
         f"Row count:\n{row_count}\n\n"
         f"Sample rows (up to 10):\n{sample_rows}\n\n"
         "Return ONLY the visualization plan as the final answer."
@@ -149,24 +221,34 @@ def visualization_planner_node(state: AgentState) -> dict:
     prior_messages = state.get("messages") or []
     messages = [system] + prior_messages + [human]
 
-    response = llm.invoke(messages)
-
-    return {
-        "messages": [response],
-        "viz_plan": response.content,
+    return None, messages, {
         "columns": columns,
+        "column_meta": column_meta,
         "sample_rows": sample_rows,
     }
 
 
-def visualization_code_generator_node(state: AgentState) -> dict:
+def visualization_planner_node(state: AgentState) -> dict:
     """
-    Generates Python Plotly code based on the visualization plan.
-    Reads from state["viz_plan"] and state["sample_rows"].
+    Generates a visualization plan using VISUALIZATION_PLANNER_PROMPT.
+    Reads query results from DB Tool output: state["db_result"].
     """
-    model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    llm = ChatOpenAI(model=model_name, temperature=0, openai_api_key=OPENAI_API_KEY)
+    early, messages, fields = _viz_planner_request(state)
+    if early is not None:
+        return early
+    response = _viz_llm().invoke(messages)
+    return {"messages": [response], "viz_plan": response.content, **fields}
+
+
+async def avisualization_planner_node(state: AgentState) -> dict:
+    early, messages, fields = _viz_planner_request(state)
+    if early is not None:
+        return early
+    response = await _viz_llm().ainvoke(messages)
+    return {"messages": [response], "viz_plan": response.content, **fields}
 
+
+def _viz_code_messages(state: AgentState) -> list:
     viz_plan = state.get("viz_plan", "")
     sample_rows = state.get("sample_rows", [])
     
@@ -184,19 +266,68 @@ def visualization_code_generator_node(state: AgentState) -> dict:
     human = HumanMessage(content=prompt)
 
     prior_messages = state.get("messages") or []
-    messages = [system] + prior_messages + [human]
+    return [system] + prior_messages + [human]
 
-    response = llm.invoke(messages)
 
+def _viz_code_result(response) -> dict:
     return {
         "messages": ["I've generated a chart based on your data!"],
         "viz_code": response.content.strip()
     }
 
 
-def sql_repair_node(state: AgentState) -> dict:
+def visualization_code_generator_node(state: AgentState) -> dict:
     """
-    SQL Repair Node: Analyzes DB errors and decides the next step based on the Dictionary.
+    Generates Python Plotly code based on the visualization plan.
+    Reads from state["viz_plan"] and state["sample_rows"].
+    """
+    return _viz_code_result(_viz_llm().invoke(_viz_code_messages(state)))
+
+
+async def avisualization_code_generator_node(state: AgentState) -> dict:
+    return _viz_code_result(await _viz_llm().ainvoke(_viz_code_messages(state)))
+
+
+def _format_scalar(value) -> str:
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    if isinstance(value, int):
+        return f"{value:,}"
+    if isinstance(value, (float, Decimal)):
+        return f"{value:,.2f}"
+    return str(value)
+
+
+def scalar_answer_node(state: AgentState) -> dict:
+    """
+    Answers single-value results (COUNT / SUM / EXISTS ...) directly from the
+    DB result, without the visualization planner and code generator LLM calls.
+    """
+    meta = (state.get("db_result") or {}).get("meta") or {}
+    scalar = meta.get("scalar") or {}
+    value = scalar.get("value")
+
+    if value is None:
+        text = "No matching data was found."
+    elif scalar.get("kind") == "exists":
+        text = "Yes." if value else "No."
+    else:
+        label = str(scalar.get("column") or "result").replace("_", " ").capitalize()
+        text = f"{label}: {_format_scalar(value)}"
+
+    approximate = meta.get("approximate") or {}
+    if approximate.get("applied"):
+        text += f" (approximate, from a {approximate.get('sample_pct')}% sample)"
+
+    return {
+        "messages": [AIMessage(content=text)],
+        "next_step": "end",
+    }
+
+
+def _repair_request(state: AgentState) -> Tuple[Optional[dict], dict]:
+    """
+    (early result, repair_reasoning_engine arguments) for the repair node.
     """
     db_result = state.get("db_result")
     attempt = state.get("repair_count", 0)
@@ -206,19 +337,27 @@ def sql_repair_node(state: AgentState) -> dict:
             "is_unsupported": True,
             "feedback_reason": "Max repair attempts reached.",
             "next_step": "orchestrator"
-        }
+        }, {}
 
     error_data = db_result.get("error", {})
+    if error_data.get("type") == "COST_LIMIT":
+        # Not a syntax problem: tell the repair agent the query has to get cheaper.
+        error_data = {
+            **error_data,
+            "message": f"{error_data.get('message')} {error_data.get('hint') or ''}".strip(),
+        }
     failed_sql = db_result.get("query", {}).get("sql")
     user_intent = state["messages"][-1].content 
 
-    decision = repair_reasoning_engine(
+    return None, dict(
         intent=user_intent, 
         sql=failed_sql, 
         error_info=error_data, 
         dictionary=DATA_DICTIONARY 
     )
-    
+
+
+def _repair_updates(decision: dict, attempt: int) -> dict:
     action = decision.get("action")
     updates = {
         "needs_clarification": False,
@@ -229,6 +368,7 @@ def sql_repair_node(state: AgentState) -> dict:
     if action == "REPAIR":
         updates.update({
             "sql_query": decision.get("repaired_sql"),
+            "sql_cache_hit": False,  # repaired SQL is new: cache it once it executes
             "repair_count": attempt + 1,
             "next_step": "db_execute"
         })
@@ -240,6 +380,23 @@ def sql_repair_node(state: AgentState) -> dict:
     return updates
 
 
+def sql_repair_node(state: AgentState) -> dict:
+    """
+    SQL Repair Node: Analyzes DB errors and decides the next step based on the Dictionary.
+    """
+    early, request = _repair_request(state)
+    if early is not None:
+        return early
+    return _repair_updates(repair_reasoning_engine(**request), state.get("repair_count", 0))
+
+
+async def asql_repair_node(state: AgentState) -> dict:
+    early, request = _repair_request(state)
+    if early is not None:
+        return early
+    return _repair_updates(await arepair_reasoning_engine(**request), state.get("repair_count", 0))
+
+
 import asyncio
 
 def make_db_execute_node(db_tool: SupabaseDBToolAsync):
@@ -252,20 +409,36 @@ def make_db_execute_node(db_tool: SupabaseDBToolAsync):
         if "max_repairs" not in state:
             state["max_repairs"] = getattr(db_tool.cfg, "max_repairs", 2)
 
-        result = await db_tool.run_sql(sql)
+        result = await db_tool.run_sql(
+            sql, explain=bool(state.get("explain")), approximate=bool(state.get("approximate"))
+        )
 
         state["db_result"] = result
 
         print("DB_OK:", result.get("ok"))
         print("DB_ERROR:", result.get("error"))
 
+        cache = get_semantic_cache()
+        cache_key = state.get("sql_cache_key")
+        if cache is not None and cache_key:
+            if result.get("ok") and not state.get("sql_cache_hit"):
+                # SQL known to execute (possibly after repairs): reuse it for rephrasings
+                cache.put(cache_key, sql)
+            elif state.get("sql_cache_hit") and (result.get("error") or {}).get("type") == "SQL_ERROR":
+                cache.discard(cache_key)
+
         if result.get("ok"):
             data = result.get("data") or {}
             state["columns"] = data.get("columns", [])
-            state["sample_rows"] = (data.get("rows") or [])[:20]
+            state["column_meta"] = data.get("column_meta", [])
+            state["sample_rows"] = envelope_rows(result, limit=20)
 
         if not result.get("ok"):
             state["last_error"] = result.get("error") or {}
+            if state["last_error"].get("type") == "OVERLOADED":
+                # load shedding: nothing to repair, tell the user to retry
+                state["is_unsupported"] = True
+                state["feedback_reason"] = "OVERLOADED: " + (state["last_error"].get("message") or "")
         else:
             state.pop("last_error", None)
 
@@ -12,8 +12,13 @@ class AgentState(TypedDict):
     next_step: str 
     
     sql_query: Optional[str]  
+    question: Optional[str]
+    sql_cache_key: Optional[str]
+    sql_cache_hit: bool
     db_result: Optional[Dict[str, Any]] 
     last_error: Optional[Dict[str, Any]]
+    explain: bool
+    approximate: bool
     
     repair_count: int  
     max_repairs: int   
@@ -26,4 +31,5 @@ class AgentState(TypedDict):
     viz_plan: Optional[str]       
     viz_code: Optional[str]       
     columns: Optional[List[str]]  
+    column_meta: Optional[List[Dict[str, Any]]]
     sample_rows: Optional[List[dict]]
\ No newline at end of file
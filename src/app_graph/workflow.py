@@ -1,16 +1,46 @@
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.runnables import RunnableLambda
 
 from .state import AgentState
 from .nodes import (
     orchestrator_node, 
+    aorchestrator_node,
     sql_generator_node, 
+    asql_generator_node,
     make_db_execute_node, 
     sql_repair_node, 
+    asql_repair_node,
     visualization_planner_node, 
-    visualization_code_generator_node
+    avisualization_planner_node,
+    visualization_code_generator_node,
+    avisualization_code_generator_node,
+    scalar_answer_node,
 )
 
+
+class _NodeRunnable(RunnableLambda):
+    """
+    langchain-core 0.1 rebuilds repr() and deps of every step on each call
+    (inspect.getsource + an AST walk of the node function): ~10 ms of event-loop
+    CPU per node. Nodes are plain functions with no nested runnables, so both are static.
+    """
+
+    def __repr__(self) -> str:
+        return f"RunnableLambda({self.name})"
+
+    @property
+    def deps(self):
+        return []
+
+
+def _node(func, afunc=None):
+    """
+    graph.invoke() runs func; graph.ainvoke() (the API) awaits afunc, so
+    concurrent requests share the event loop instead of each holding a worker thread.
+    """
+    return _NodeRunnable(func, afunc=afunc, name=func.__name__)
+
 def route_after_db(state: AgentState):
     """
     Decides the next path based on DB Tool execution results.
@@ -18,7 +48,13 @@ def route_after_db(state: AgentState):
     db_res = state.get("db_result") or {}
     
     if db_res.get("ok"):
+        # single-value results need no chart
+        if (db_res.get("meta") or {}).get("scalar"):
+            return "scalar"
         return "viz"
+
+    if (db_res.get("error") or {}).get("type") == "OVERLOADED":
+        return "stop"
     
     current_count = state.get("repair_count", 0)
     max_limit = state.get("max_repairs") if state.get("max_repairs") is not None else 3
@@ -38,12 +74,13 @@ def route_after_repair(state: AgentState):
 def build_querymate_workflow(db_tool_instance, checkpointer=True):
     workflow = StateGraph(AgentState)
 
-    workflow.add_node("orchestrator", orchestrator_node)
-    workflow.add_node("sql_generator", sql_generator_node)
-    workflow.add_node("db_execute", make_db_execute_node(db_tool_instance))
-    workflow.add_node("sql_repair", sql_repair_node)
-    workflow.add_node("viz_planner", visualization_planner_node)
-    workflow.add_node("viz_generator", visualization_code_generator_node)
+    workflow.add_node("orchestrator", _node(orchestrator_node, aorchestrator_node))
+    workflow.add_node("sql_generator", _node(sql_generator_node, asql_generator_node))
+    workflow.add_node("db_execute", _node(make_db_execute_node(db_tool_instance)))
+    workflow.add_node("sql_repair", _node(sql_repair_node, asql_repair_node))
+    workflow.add_node("viz_planner", _node(visualization_planner_node, avisualization_planner_node))
+    workflow.add_node("viz_generator", _node(visualization_code_generator_node, avisualization_code_generator_node))
+    workflow.add_node("scalar_answer", _node(scalar_answer_node))
 
     workflow.set_entry_point("orchestrator")
     
@@ -54,6 +91,7 @@ def build_querymate_workflow(db_tool_instance, checkpointer=True):
         route_after_db,
         {
             "viz": "viz_planner",
+            "scalar": "scalar_answer",
             "repair": "sql_repair",
             "stop": "orchestrator"
         }
@@ -70,6 +108,7 @@ def build_querymate_workflow(db_tool_instance, checkpointer=True):
 
     workflow.add_edge("viz_planner", "viz_generator")
     workflow.add_edge("viz_generator", "orchestrator") 
+    workflow.add_edge("scalar_answer", END)
 
     workflow.add_conditional_edges(
         "orchestrator",
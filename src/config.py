@@ -4,3 +4,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# QUERYMATE_DB_URL overrides SUPABASE_DB_URL; "sqlite:///data/northwind.db" runs offline
+# on the local Northwind file (see src/database/local_backend.py)
+DATABASE_URL = os.getenv("QUERYMATE_DB_URL") or os.getenv("SUPABASE_DB_URL")
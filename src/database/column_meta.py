@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence
+
+_NUMERIC = {"int2", "int4", "int8", "oid", "numeric", "float4", "float8", "money"}
+_TEMPORAL = {"date", "time", "timetz", "timestamp", "timestamptz", "interval"}
+_BOOLEAN = {"bool"}
+
+
+def type_category(pg_type: Optional[str]) -> str:
+    '''
+    Coarse type family used by the viz planner / frontend:
+    numeric | temporal | boolean | text
+    '''
+    if pg_type in _NUMERIC:
+        return "numeric"
+    if pg_type in _TEMPORAL:
+        return "temporal"
+    if pg_type in _BOOLEAN:
+        return "boolean"
+    return "text"
+
+
+def column_meta_from_statement(stmt: Any, records: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+    '''
+    Column names and PostgreSQL types from the prepared statement's RowDescription,
+    which asyncpg already received when preparing: no extra query, and it works for
+    empty results too.
+
+    RowDescription does not carry NOT NULL, so "nullable" is True when a NULL was
+    seen in the returned rows and None (unknown) otherwise.
+    '''
+    meta = []
+    for i, attr in enumerate(stmt.get_attributes()):
+        pg_type = getattr(attr.type, "name", None)
+        seen_null = any(r[i] is None for r in records)
+        meta.append({
+            "name": attr.name,
+            "type": pg_type,
+            "category": type_category(pg_type),
+            "nullable": True if seen_null else None,
+        })
+    return meta
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+
+def unique_column_names(columns: List[str]) -> List[str]:
+    '''
+    Result column names may repeat (SELECT a.id, b.id / two count(*)); values is
+    keyed by name, so later duplicates get a suffix: id, id_1, id_2.
+    '''
+    seen = set(columns)
+    out: List[str] = []
+    for name in columns:
+        if name in out:
+            n = 1
+            while f"{name}_{n}" in seen:
+                n += 1
+            name = f"{name}_{n}"
+            seen.add(name)
+        out.append(name)
+    return out
+
+
+def records_to_columnar(records: Sequence[Any], columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    '''
+    Transpose asyncpg Records (or any sequence of tuples) into
+    {"format": "columnar", "columns": [...], "values": {column: [v0, v1, ...]}, "row_count": n}.
+
+    Column names are stored once instead of on every row, and no per-row dict is built.
+    Duplicate names are made unique (see unique_column_names).
+    '''
+    if columns is None:
+        columns = list(records[0].keys()) if records else []
+    columns = unique_column_names(list(columns))
+    transposed = list(zip(*records)) if records else [() for _ in columns]
+    return {
+        "format": "columnar",
+        "columns": columns,
+        "values": {c: list(v) for c, v in zip(columns, transposed)},
+        "row_count": len(records),
+    }
+
+
+def rows_to_columnar(rows: List[Dict[str, Any]], columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    if columns is None:
+        columns = list(rows[0].keys()) if rows else []
+    return {
+        "format": "columnar",
+        "columns": columns,
+        "values": {c: [r.get(c) for r in rows] for c in columns},
+        "row_count": len(rows),
+    }
+
+
+def is_columnar(data: Optional[Dict[str, Any]]) -> bool:
+    return bool(data) and data.get("format") == "columnar"
+
+
+def columnar_slice(data: Dict[str, Any], limit: int) -> Dict[str, Any]:
+    values = {c: v[:limit] for c, v in (data.get("values") or {}).items()}
+    return {
+        "format": "columnar",
+        "columns": data.get("columns") or [],
+        "values": values,
+        "row_count": min(limit, data.get("row_count") or 0),
+    }
+
+
+def columnar_to_rows(data: Dict[str, Any], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    columns = data.get("columns") or []
+    values = data.get("values") or {}
+    n = data.get("row_count") or 0
+    if limit is not None:
+        n = min(n, limit)
+    return [{c: values[c][i] for c in columns} for i in range(n)]
+
+
+def envelope_rows(envelope: Dict[str, Any], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    '''
+    Row dicts from an ok envelope in either format.
+    '''
+    data = (envelope or {}).get("data") or {}
+    if is_columnar(data):
+        return columnar_to_rows(data, limit)
+    rows = data.get("rows") or []
+    return rows[:limit] if limit is not None else rows
+
+
+def envelope_columnar(envelope: Dict[str, Any], limit: Optional[int] = None) -> Dict[str, Any]:
+    '''
+    Columnar view of an ok envelope in either format (optionally truncated).
+    '''
+    data = (envelope or {}).get("data") or {}
+    if not is_columnar(data):
+        data = rows_to_columnar(data.get("rows") or [], data.get("columns") or None)
+    return columnar_slice(data, limit) if limit is not None else data
+
+
+def columnar_to_dataframe(data: Dict[str, Any]) -> pd.DataFrame:
+    '''
+    Each value list becomes one DataFrame column directly; nothing is rebuilt row by row.
+    '''
+    columns = data.get("columns") or []
+    return pd.DataFrame(data.get("values") or {}, columns=columns, copy=False)
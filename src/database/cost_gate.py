@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+def parse_plan(query_plan: Any) -> Any:
+    '''
+    asyncpg returns EXPLAIN (FORMAT JSON) output as a JSON string.
+    '''
+    if isinstance(query_plan, str):
+        return json.loads(query_plan)
+    return query_plan
+
+
+def plan_estimates(explain_json: Any) -> tuple:
+    '''
+    (total_cost, plan_rows) of the top plan node, or (None, None) if unavailable.
+    '''
+    plan = parse_plan(explain_json)
+    if isinstance(plan, list) and plan:
+        plan = plan[0]
+    top = (plan or {}).get("Plan") or {}
+    return top.get("Total Cost"), top.get("Plan Rows")
+
+
+@dataclass(frozen=True)
+class CostDecision:
+    action: str  # "admit" | "reject" | "limit" | "queue"
+    total_cost: Optional[float]
+    plan_rows: Optional[float]
+
+    def as_meta(self) -> dict:
+        return {"action": self.action, "total_cost": self.total_cost, "plan_rows": self.plan_rows}
+
+
+def decide(cfg: Any, explain_json: Any) -> CostDecision:
+    '''
+    Compare planner estimates with the DBToolConfig limits.
+
+    Over the cost limit -> cfg.cost_gate_action ("reject" or "queue").
+    Over the row limit only -> "limit" (a tighter LIMIT makes the query cheap again),
+    unless the action is "reject".
+    '''
+    cost, rows = plan_estimates(explain_json)
+    over_cost = cost is not None and cost > cfg.max_plan_cost
+    over_rows = rows is not None and rows > cfg.max_plan_rows
+
+    if over_cost and cfg.cost_gate_action in ("reject", "queue"):
+        return CostDecision(cfg.cost_gate_action, cost, rows)
+    if over_cost or over_rows:
+        action = "reject" if cfg.cost_gate_action == "reject" else "limit"
+        return CostDecision(action, cost, rows)
+    return CostDecision("admit", cost, rows)
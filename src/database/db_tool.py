@@ -1,12 +1,43 @@
 from __future__ import annotations
 
-import re
+import asyncio
+import random
 import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple, TypedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, TypedDict, Union
 
 import asyncpg
 
+from src.database.columnar import records_to_columnar
+from src.database.result_cache import ResultCache, as_cache_hit, result_cache_key
+from src.database.result_handles import (
+    PagePosition,
+    encode_cursor,
+    key_count_sql,
+    keyset_page_sql,
+    page_keys,
+    row_key,
+    row_number_page_sql,
+)
+from src.database.column_meta import column_meta_from_statement
+from src.database.cost_gate import decide, parse_plan, plan_estimates
+from src.database.limit_enforcer import enforce_limit, enforce_limit_wrapper, single_row_shape
+from src.database.local_backend import LocalPool, LocalSQLError, is_local_url
+from src.database.pool import PoolOverloaded
+from src.database.query_stats import QueryStatsRegistry
+from src.database.routing import PoolRouter
+from src.database.sampling import sample_rewrite
+from src.database.sql_policy import validate_sql_policy
+from src.database.statement_cache import (
+    PreparedStatementCache,
+    fetch_prepared,
+    fetch_with_statement,
+    fetchrow_with_statement,
+    sql_fingerprint,
+)
+
 @dataclass(frozen=True)
 class DBToolConfig:
     database_url: str 
@@ -17,6 +48,52 @@ class DBToolConfig:
     enforce_limit: bool = True
     allow_multi_statement: bool = False
     max_repairs: int = 2 
+    statement_cache_size: int = 256  # prepared statements kept per connection (0 disables)
+    result_cache_ttl_s: float = 300.0  # TTL for entries written to the optional result cache
+    # "pool": timeouts + read-only applied once per connection via server_settings (no extra round trips)
+    # "transaction": BEGIN READ ONLY + SET LOCAL batched into one round trip per query
+    #                (for poolers that drop startup parameters)
+    timeout_mode: str = "pool"
+    # EXPLAIN capture, always done in the background after the result is returned:
+    # "never" | "sample" (explain_sample_pct of queries) | "slow" (execution_ms >= explain_slow_ms)
+    # run_sql(..., explain=True) requests a plan regardless of policy.
+    explain_policy: str = "never"
+    explain_sample_pct: float = 1.0
+    explain_slow_ms: int = 1_000
+    explain_store_size: int = 256
+    # "rows": data.rows is a list of dicts; "columnar": data.values maps column -> value list
+    result_format: str = "rows"
+    # EXPLAIN-based admission gate (costs one extra round trip when enabled):
+    # "off" | "reject" (COST_LIMIT error) | "limit" (re-run capped at cost_gate_limit_rows)
+    # | "queue" (over-cost queries wait for the low-priority lane)
+    cost_gate_action: str = "off"
+    max_plan_cost: float = 1_000_000.0
+    max_plan_rows: float = 1_000_000.0
+    cost_gate_limit_rows: int = 500
+    low_priority_concurrency: int = 1
+    # EXPLAIN the SQL before and after limit enforcement and report both costs in meta.limit
+    # (two extra round trips, for diagnostics only)
+    report_limit_costs: bool = False
+    # Pool sizing + admission: asyncpg grows the pool on demand between min and max and
+    # closes connections idle for pool_max_idle_s. At most pool_max_queue_depth requests
+    # wait for a connection, each for at most pool_acquire_timeout_ms; the rest get OVERLOADED.
+    pool_min_size: int = 1
+    pool_max_size: int = 5
+    pool_max_idle_s: float = 300.0
+    pool_max_queue_depth: int = 20
+    pool_acquire_timeout_ms: int = 2_000
+    # Read replicas: read-only queries go to the least busy healthy replica whose lag is
+    # <= max_replica_lag_s, otherwise to database_url (the primary)
+    replica_urls: Tuple[str, ...] = ()
+    max_replica_lag_s: float = 5.0
+    health_check_interval_s: float = 10.0
+    # run_sql(..., approximate=True): the first of these tables found in the query is read
+    # with TABLESAMPLE <method> (approximate_sample_pct) and COUNT/SUM are scaled by 100/pct
+    approximate_tables: Tuple[str, ...] = ("order_details", "orders")
+    approximate_sample_pct: float = 10.0
+    approximate_method: str = "SYSTEM"
+    # fingerprints kept by the in-process query statistics (0 disables)
+    query_stats_max_entries: int = 500
 
 def ok_envelope(
     sql: str,
@@ -25,12 +102,31 @@ def ok_envelope(
     row_count: int,
     execution_ms: int,
     explain_json: Any,
+    cache_hit: bool = False,
+    explain_id: Optional[str] = None,
+    data: Optional[Dict[str, Any]] = None,
+    column_meta: Optional[List[Dict[str, Any]]] = None,
+    extra_meta: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
+    '''
+    `data` overrides the default row-format payload (used for columnar results).
+    `column_meta` is attached to either format as data.column_meta.
+    `extra_meta` is merged into meta (e.g. cost gate decisions).
+    '''
+    if data is None:
+        data = {"columns": columns, "rows": rows, "row_count": row_count}
+    data["column_meta"] = column_meta or []
     return {
         "ok": True,
         "query": {"sql": sql, "params": {}},
-        "data": {"columns": columns, "rows": rows, "row_count": row_count},
-        "meta": {"execution_ms": execution_ms, "explain_json": explain_json},
+        "data": data,
+        "meta": {
+            "execution_ms": execution_ms,
+            "explain_json": explain_json,
+            "explain_id": explain_id,
+            "cache_hit": cache_hit,
+            **(extra_meta or {}),
+        },
         "error": None,
     }
 
@@ -59,44 +155,72 @@ def err_envelope(
         },
     }
 
-_FORBIDDEN = re.compile(
-    r"\b("
-    r"insert|update|delete|drop|alter|truncate|create|grant|revoke|comment|"
-    r"vacuum|analyze|cluster|copy|do|call|execute|listen|notify|"
-    r"security\s+definer|pg_sleep"
-    r")\b",
-    flags=re.IGNORECASE,
+SCHEMA_SQL = (
+    "SELECT table_name, column_name, data_type FROM information_schema.columns "
+    "WHERE table_schema = 'public' ORDER BY table_name, ordinal_position"
 )
-_SELECT_LIKE = re.compile(r"^\s*(with\b.*?\bselect\b|select\b)", flags=re.IGNORECASE | re.DOTALL) # SELECT-only check
-_SEMICOLON = re.compile(r";") 
 
-def validate_sql_policy(sql: str, allow_multi_statement: bool) -> Tuple[bool, Optional[str]]:
+# Errors that become SQL_ERROR envelopes (PostgreSQL or the embedded local backend).
+DB_ERRORS = (asyncpg.PostgresError, LocalSQLError)
+
+
+class DBToolError(Exception):
+    '''
+    Raised by APIs that cannot return an envelope (e.g. stream_sql).
+    The matching err_envelope is attached as .envelope.
     '''
-    Policy validation function
-    This runs before any DB call.
 
-    If it fails → returns a POLICY_VIOLATION error
-    The database is never touched.
+    def __init__(self, envelope: Dict[str, Any]):
+        super().__init__((envelope.get("error") or {}).get("message"))
+        self.envelope = envelope
+
+
+def should_capture_explain(cfg: DBToolConfig, execution_ms: int, requested: bool) -> bool:
+    if requested:
+        return True
+    if cfg.explain_policy == "sample":
+        return random.random() * 100 < cfg.explain_sample_pct
+    if cfg.explain_policy == "slow":
+        return execution_ms >= cfg.explain_slow_ms
+    return False
+
+
+def session_server_settings(cfg: DBToolConfig) -> Dict[str, str]:
+    '''
+    Connection startup parameters for timeout_mode="pool".
+    Sent once when the pool opens a connection, so queries pay no extra round trip.
     '''
-    if not isinstance(sql, str) or not sql.strip():
-        return False, "Empty SQL."
-    if not _SELECT_LIKE.search(sql):
-        return False, "Only SELECT queries are allowed (SELECT / WITH ... SELECT)."
-    if _FORBIDDEN.search(sql):
-        return False, "Forbidden operation detected (read-only queries only)."
-    if not allow_multi_statement:
-        if _SEMICOLON.search(sql.strip().rstrip(";")):
-            return False, "Multiple statements are not allowed."
-    return True, None
+    return {
+        "statement_timeout": str(int(cfg.statement_timeout_ms)),
+        "lock_timeout": str(int(cfg.lock_timeout_ms)),
+        "idle_in_transaction_session_timeout": str(int(cfg.idle_in_tx_timeout_ms)),
+        "default_transaction_read_only": "on",
+    }
 
 
-def enforce_limit_wrapper(sql: str, max_rows: int) -> str:
-    return f"SELECT * FROM ({sql}) AS _q LIMIT {int(max_rows)}"
+def transaction_prologue(cfg: DBToolConfig) -> str:
+    '''
+    Single simple-protocol message for timeout_mode="transaction".
+    SET LOCAL only lasts until the end of the transaction, so it must follow BEGIN.
+    '''
+    return (
+        "BEGIN READ ONLY; "
+        f"SET LOCAL statement_timeout = {int(cfg.statement_timeout_ms)}; "
+        f"SET LOCAL lock_timeout = {int(cfg.lock_timeout_ms)}; "
+        f"SET LOCAL idle_in_transaction_session_timeout = {int(cfg.idle_in_tx_timeout_ms)};"
+    )
 
 class SupabaseDBToolAsync:
-    def __init__(self, cfg: DBToolConfig):
+    def __init__(self, cfg: DBToolConfig, result_cache: Optional[ResultCache] = None):
         self.cfg = cfg
-        self._pool: Optional[asyncpg.Pool] = None
+        self.result_cache = result_cache
+        self._pool: Optional[Union[PoolRouter, LocalPool]] = None
+        self.statement_cache = PreparedStatementCache(max_size=cfg.statement_cache_size)
+        self._explain_plans: "OrderedDict[str, Any]" = OrderedDict()
+        self._background: set = set()
+        self._low_priority = asyncio.Semaphore(max(1, cfg.low_priority_concurrency))
+        self.cancelled_queries = 0
+        self.query_stats = QueryStatsRegistry(max_entries=cfg.query_stats_max_entries)
 
     async def start(self) -> None:
         '''
@@ -104,14 +228,296 @@ class SupabaseDBToolAsync:
         - Reused connections
         - Required for FastAPI async
         '''
-        self._pool = await asyncpg.create_pool(dsn=self.cfg.database_url, min_size=1, max_size=5)
+        if is_local_url(self.cfg.database_url):
+            # embedded SQLite (e.g. sqlite:///data/northwind.db), see local_backend
+            self._pool = await LocalPool.create(self.cfg)
+            return
+        server_settings = session_server_settings(self.cfg) if self.cfg.timeout_mode == "pool" else None
+        self._pool = await PoolRouter.create(self.cfg, server_settings=server_settings)
+
+    def pool_metrics(self) -> Dict[str, Any]:
+        if not self._pool:
+            return {"started": False}
+        return {"started": True, **self._pool.metrics()}
 
     async def close(self) -> None:
+        for task in list(self._background):
+            task.cancel()
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
         if self._pool:
             await self._pool.close()
             self._pool = None
+        self.statement_cache.invalidate()
+
+    def invalidate_statement_cache(self) -> None:
+        '''
+        Drop every cached prepared statement (call after schema changes).
+        Cached results are dropped too since they may no longer match the schema.
+        '''
+        self.statement_cache.invalidate()
+        if self.result_cache is not None:
+            self.result_cache.invalidate()
+
+    async def fetch_schema(self) -> Dict[str, List[Dict[str, str]]]:
+        '''
+        table -> [{"column", "type"}] of the live database, in the shape of
+        schema.get_db_schema_json (e.g. to notice schema changes at startup).
+        '''
+        if isinstance(self._pool, LocalPool):
+            return await self._pool.schema()
+        async with self._pool.acquire() as conn:
+            async with self._read_only_scope(conn):
+                rows = await conn.fetch(SCHEMA_SQL)
+        schema: Dict[str, List[Dict[str, str]]] = {}
+        for r in rows:
+            schema.setdefault(r["table_name"], []).append({"column": r["column_name"], "type": r["data_type"]})
+        return schema
+
+    @asynccontextmanager
+    async def _read_only_scope(self, conn: Any):
+        '''
+        In "pool" mode the connection is already read-only with timeouts set.
+        In "transaction" mode open the scoped transaction and always roll it back.
+        '''
+        if self.cfg.timeout_mode != "transaction":
+            yield
+            return
+
+        await conn.execute(transaction_prologue(self.cfg))
+        try:
+            yield
+        finally:
+            if not conn.is_closed():
+                await conn.execute("ROLLBACK")
+
+    def get_explain_plan(self, explain_id: str) -> Optional[Any]:
+        '''
+        Plan captured for a previous run_sql call (None while still pending or unknown).
+        '''
+        return self._explain_plans.get(explain_id)
+
+    def _schedule_explain(self, final_sql: str) -> str:
+        explain_id = sql_fingerprint(final_sql)
+        task = asyncio.create_task(self._capture_explain(explain_id, final_sql))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return explain_id
+
+    async def _capture_explain(self, explain_id: str, final_sql: str) -> None:
+        '''
+        Runs on its own pool connection after the caller already has its result.
+        '''
+        try:
+            async with self._pool.acquire() as conn:
+                async with self._read_only_scope(conn):
+                    rows = await fetch_prepared(self.statement_cache, conn, f"EXPLAIN (FORMAT JSON) {final_sql}")
+            plan = parse_plan(rows[0]["QUERY PLAN"]) if rows else None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            plan = {"error": str(e)}
+
+        self._explain_plans[explain_id] = plan
+        self._explain_plans.move_to_end(explain_id)
+        while len(self._explain_plans) > self.cfg.explain_store_size:
+            self._explain_plans.popitem(last=False)
+
+    async def _plan_cost(self, conn: Any, sql: str) -> Optional[float]:
+        rows = await fetch_prepared(self.statement_cache, conn, f"EXPLAIN (FORMAT JSON) {sql}")
+        return plan_estimates(rows[0]["QUERY PLAN"])[0] if rows else None
+
+    async def _fetch(
+        self, conn: Any, sql: str, final_sql: str, limit_mode: str, extra_meta: Dict[str, Any]
+    ) -> Tuple[List[Any], List[Dict[str, Any]]]:
+        '''
+        (records, column_meta) of final_sql on conn, inside run_sql's read-only scope.
+        '''
+        if self.cfg.report_limit_costs and limit_mode not in ("off", "kept", "single_row"):
+            extra_meta["limit"]["cost_before"] = await self._plan_cost(conn, sql)
+            extra_meta["limit"]["cost_after"] = await self._plan_cost(conn, final_sql)
+        if limit_mode == "single_row":
+            stmt, record = await fetchrow_with_statement(self.statement_cache, conn, final_sql)
+            data_rows = [record] if record is not None else []
+        else:
+            stmt, data_rows = await fetch_with_statement(self.statement_cache, conn, final_sql)
+        return data_rows, column_meta_from_statement(stmt, data_rows)
+
+    async def stream_sql(
+        self, sql: str, batch_size: int = 500, max_rows: Optional[int] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        '''
+        Yields lists of up to batch_size row dicts read from a server-side cursor.
+
+        Only one batch is materialized at a time, so memory stays bounded and the
+        first rows arrive before the query finishes. max_rows=None streams the full
+        result (statement_timeout still applies). Errors raise DBToolError.
+        '''
+        sql = (sql or "").strip().rstrip(";").strip()
+
+        ok, reason = validate_sql_policy(sql, self.cfg.allow_multi_statement)
+        if not ok:
+            raise DBToolError(err_envelope(sql=sql, error_type="POLICY_VIOLATION", message=reason or "Policy violation"))
+
+        final_sql = enforce_limit(sql, max_rows)[0] if max_rows is not None else sql
+
+        if not self._pool:
+            raise DBToolError(err_envelope(
+                sql=final_sql,
+                error_type="INTERNAL_ERROR",
+                message="DB pool not started. Call db_tool.start() at app startup.",
+            ))
 
-    async def run_sql(self, sql: str) -> Dict[str, Any]:
+        try:
+            async with self._pool.acquire() as conn:
+                async with self._read_only_scope(conn):
+                    # Cursors need a transaction; "transaction" mode already opened one.
+                    tx = conn.transaction(readonly=True) if not conn.is_in_transaction() else None
+                    if tx is not None:
+                        await tx.start()
+                    try:
+                        stmt = await self.statement_cache.prepare(conn, final_sql)
+                        cursor = await stmt.cursor()
+                        while True:
+                            batch = await cursor.fetch(batch_size)
+                            if not batch:
+                                break
+                            yield [dict(r) for r in batch]
+                            if len(batch) < batch_size:
+                                break
+                    finally:
+                        if tx is not None and not conn.is_closed():
+                            await tx.rollback()
+        except PoolOverloaded as e:
+            raise DBToolError(err_envelope(sql=final_sql, error_type="OVERLOADED", message=str(e))) from e
+        except DB_ERRORS as e:
+            raise DBToolError(err_envelope(
+                sql=final_sql,
+                error_type="SQL_ERROR",
+                code=getattr(e, "sqlstate", None),
+                message=str(e).strip(),
+                hint=getattr(e, "hint", None),
+                details=getattr(e, "detail", None),
+            )) from e
+
+    async def fetch_page(
+        self,
+        sql: str,
+        position: PagePosition = 0,
+        page_size: int = 100,
+        column_meta: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        '''
+        One page of the full result (not capped at max_rows); meta.next_cursor is
+        None on the last page.
+
+        With the result's column_meta, pages are keyset pages (see
+        result_handles.page_keys): ordered by the statement's ORDER BY plus every
+        output column, each starting after the previous page's last key. Results
+        that cannot be keyed fall back to row numbers.
+        '''
+        t0 = time.time()
+        sql = (sql or "").strip().rstrip(";").strip()
+
+        ok, reason = validate_sql_policy(sql, self.cfg.allow_multi_statement)
+        if not ok:
+            return err_envelope(sql=sql, error_type="POLICY_VIOLATION", message=reason or "Policy violation")
+
+        keys = page_keys(sql, column_meta or [])
+        if keys is not None and isinstance(position, list):
+            if len(position) != len(keys):
+                return err_envelope(sql=sql, error_type="INVALID_CURSOR", message="Cursor does not match this result.")
+            page_sql, args = keyset_page_sql(sql, keys, after_key=True), [*position, int(page_size) + 1]
+        elif keys is not None and not position:
+            page_sql, args = keyset_page_sql(sql, keys, after_key=False), [int(page_size) + 1]
+        elif keys is None and isinstance(position, int):
+            page_sql, args = row_number_page_sql(sql), [position, int(page_size) + 1]
+        else:
+            return err_envelope(sql=sql, error_type="INVALID_CURSOR", message="Cursor does not match this result.")
+
+        if not self._pool:
+            return err_envelope(
+                sql=page_sql,
+                error_type="INTERNAL_ERROR",
+                message="DB pool not started. Call db_tool.start() at app startup.",
+            )
+
+        try:
+            async with self._pool.acquire() as conn:
+                async with self._read_only_scope(conn):
+                    stmt, data_rows = await fetch_with_statement(self.statement_cache, conn, page_sql, *args)
+                    page_meta = column_meta_from_statement(stmt, data_rows)
+                    if keys is None:
+                        page_meta = page_meta[:-1]  # drop _qm_row
+                    ties = 0
+                    if keys is not None and len(data_rows) > page_size:
+                        last = tuple(data_rows[page_size - 1])
+                        if tuple(data_rows[page_size]) == last:
+                            # identical rows straddle the boundary and share one key: finish them here
+                            _, total = await fetchrow_with_statement(
+                                self.statement_cache, conn, key_count_sql(sql, keys),
+                                *row_key(keys, [c["name"] for c in page_meta], last),
+                            )
+                            ties = total[0] - sum(1 for r in data_rows[:page_size] if tuple(r) == last)
+        except PoolOverloaded as e:
+            return err_envelope(
+                sql=page_sql,
+                error_type="OVERLOADED",
+                message=str(e),
+                execution_ms=int((time.time() - t0) * 1000),
+            )
+        except DB_ERRORS as e:
+            return err_envelope(
+                sql=page_sql,
+                error_type="SQL_ERROR",
+                code=getattr(e, "sqlstate", None),
+                message=str(e).strip(),
+                hint=getattr(e, "hint", None),
+                details=getattr(e, "detail", None),
+                execution_ms=int((time.time() - t0) * 1000),
+            )
+
+        has_more = len(data_rows) > page_size
+        data_rows = data_rows[:page_size]
+        columns = [c["name"] for c in page_meta]
+        if keys is not None:
+            records = [tuple(r) for r in data_rows] + [tuple(r) for r in data_rows[-1:]] * ties
+            next_position: PagePosition = row_key(keys, columns, records[-1]) if records else position
+        else:
+            records = [tuple(r)[:-1] for r in data_rows]
+            next_position = data_rows[-1]["_qm_row"] if data_rows else position
+
+        if self.cfg.result_format == "columnar":
+            data, rows = records_to_columnar(records, columns), None
+        else:
+            data, rows = None, [dict(zip(columns, r)) for r in records]
+
+        return ok_envelope(
+            sql=page_sql,
+            columns=columns,
+            rows=rows,
+            row_count=len(records),
+            execution_ms=int((time.time() - t0) * 1000),
+            explain_json=None,
+            data=data,
+            column_meta=page_meta,
+            extra_meta={"next_cursor": encode_cursor(next_position) if has_more else None},
+        )
+
+    async def run_sql(self, sql: str, explain: bool = False, approximate: bool = False) -> Dict[str, Any]:
+        '''
+        approximate=True runs a fast preview: scans of cfg.approximate_tables use
+        TABLESAMPLE and COUNT/SUM are scaled up (see sampling.sample_rewrite).
+        meta.approximate says whether sampling was applied; re-run with
+        approximate=False for exact numbers.
+
+        Every call is recorded in self.query_stats under the SQL's fingerprint.
+        '''
+        envelope = await self._run_sql(sql, explain, approximate)
+        self.query_stats.record_envelope(sql, envelope)
+        return envelope
+
+    async def _run_sql(self, sql: str, explain: bool, approximate: bool) -> Dict[str, Any]:
         t0 = time.time()
 
         sql = (sql or "").strip()
@@ -127,7 +533,34 @@ class SupabaseDBToolAsync:
                 execution_ms=int((time.time() - t0) * 1000),
             )
 
-        final_sql = enforce_limit_wrapper(sql, self.cfg.max_rows) if self.cfg.enforce_limit else sql
+        exact_sql, approx_meta = sql, None
+        if approximate:
+            sampled, reason = sample_rewrite(
+                sql, self.cfg.approximate_tables, self.cfg.approximate_sample_pct, self.cfg.approximate_method
+            )
+            if sampled is not None:
+                sql, approx_meta = sampled.sql, {"applied": True, **sampled.as_meta()}
+            else:
+                approx_meta = {"applied": False, "reason": reason}
+
+        # at most one row (COUNT / EXISTS style questions): no LIMIT, fetchrow instead of fetch
+        shape = single_row_shape(sql)
+        if shape is not None:
+            final_sql, limit_mode = sql, "single_row"
+        elif self.cfg.enforce_limit:
+            final_sql, limit_mode = enforce_limit(sql, self.cfg.max_rows)
+        else:
+            final_sql, limit_mode = sql, "off"
+
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = result_cache_key(sql, self.cfg)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                hit = as_cache_hit(cached, int((time.time() - t0) * 1000))
+                if explain and self._pool:
+                    hit["meta"]["explain_id"] = self._schedule_explain(final_sql)
+                return hit
 
         if not self._pool:
             return err_envelope(
@@ -138,31 +571,101 @@ class SupabaseDBToolAsync:
             )
 
         try:
+            extra_meta = {"limit": {"mode": limit_mode, "cost_before": None, "cost_after": None}}
+            if approx_meta is not None:
+                extra_meta["approximate"] = approx_meta
+            fetched = None
+            # the EXPLAIN of the cost gate and the query share one connection (one acquire,
+            # one extra round trip); only queued over-cost queries give it back and wait
             async with self._pool.acquire() as conn:
-                await conn.execute(f"SET LOCAL statement_timeout = {int(self.cfg.statement_timeout_ms)};")
-                await conn.execute(f"SET LOCAL lock_timeout = {int(self.cfg.lock_timeout_ms)};")
-                await conn.execute(f"SET LOCAL idle_in_transaction_session_timeout = {int(self.cfg.idle_in_tx_timeout_ms)};")
+                async with self._read_only_scope(conn):
+                    decision = None
+                    if self.cfg.cost_gate_action != "off":
+                        explain_rows = await fetch_prepared(self.statement_cache, conn, f"EXPLAIN (FORMAT JSON) {final_sql}")
+                        plan = parse_plan(explain_rows[0]["QUERY PLAN"]) if explain_rows else None
+                        decision = decide(self.cfg, plan)
+                        extra_meta["cost_gate"] = decision.as_meta()
 
-                explain_rows = await conn.fetch(f"EXPLAIN (FORMAT JSON) {final_sql}")
-                explain_json = explain_rows[0]["QUERY PLAN"] if explain_rows else None
+                        if decision.action == "reject":
+                            return err_envelope(
+                                sql=final_sql,
+                                error_type="COST_LIMIT",
+                                message=(
+                                    f"Query rejected before execution: estimated cost {decision.total_cost} "
+                                    f"(limit {self.cfg.max_plan_cost}), estimated rows {decision.plan_rows} "
+                                    f"(limit {self.cfg.max_plan_rows})."
+                                ),
+                                hint="Check for missing JOIN conditions (cross joins), add filters, aggregate, or add a LIMIT.",
+                                explain_json=plan,
+                                execution_ms=int((time.time() - t0) * 1000),
+                            )
+                        if decision.action == "limit":
+                            final_sql, limit_mode = enforce_limit(sql, min(self.cfg.cost_gate_limit_rows, self.cfg.max_rows))
+                            extra_meta["limit"]["mode"] = limit_mode
 
-                data_rows = await conn.fetch(final_sql)
+                    if decision is None or decision.action != "queue":
+                        fetched = await self._fetch(conn, sql, final_sql, limit_mode, extra_meta)
 
+            if fetched is None:
+                # over-cost and queued: wait for the low-priority lane without holding a connection
+                async with self._low_priority, self._pool.acquire() as conn:
+                    async with self._read_only_scope(conn):
+                        fetched = await self._fetch(conn, sql, final_sql, limit_mode, extra_meta)
+            data_rows, column_meta = fetched
+
+            columns = [c["name"] for c in column_meta]
+            if shape is not None and len(columns) == 1:
+                extra_meta["scalar"] = {
+                    "kind": shape,
+                    "column": columns[0],
+                    "value": data_rows[0][0] if data_rows else None,
+                }
+            if self.cfg.result_format == "columnar":
+                data = records_to_columnar(data_rows, columns)
+                rows, row_count = None, data["row_count"]
+            else:
+                data = None
                 rows = [dict(r) for r in data_rows] 
-                columns = list(rows[0].keys()) if rows else []
                 row_count = len(rows)
 
-                ms = int((time.time() - t0) * 1000)
-                return ok_envelope(
-                    sql=final_sql,
-                    columns=columns,
-                    rows=rows,
-                    row_count=row_count,
-                    execution_ms=ms,
-                    explain_json=explain_json,
-                )
-
-        except asyncpg.PostgresError as e:
+            ms = int((time.time() - t0) * 1000)
+            explain_id = self._schedule_explain(final_sql) if should_capture_explain(self.cfg, ms, explain) else None
+            envelope = ok_envelope(
+                sql=final_sql,
+                columns=columns,
+                rows=rows,
+                row_count=row_count,
+                execution_ms=ms,
+                explain_json=None,
+                explain_id=explain_id,
+                data=data,
+                column_meta=column_meta,
+                extra_meta=extra_meta,
+            )
+            if cache_key is not None:
+                self.result_cache.set(cache_key, envelope, ttl_s=self.cfg.result_cache_ttl_s)
+            return envelope
+
+        except asyncio.CancelledError:
+            # The caller went away (e.g. HTTP client disconnected). asyncpg sends a
+            # PostgreSQL CancelRequest for the running statement, and the shielded pool
+            # release waits for it to finish, so the connection is reused, not dropped.
+            self.cancelled_queries += 1
+            raise
+        except PoolOverloaded as e:
+            return err_envelope(
+                sql=final_sql,
+                error_type="OVERLOADED",
+                message=str(e),
+                hint="Too many concurrent queries; retry shortly.",
+                execution_ms=int((time.time() - t0) * 1000),
+            )
+        except DB_ERRORS as e:
+            if approx_meta is not None and approx_meta["applied"]:
+                # the sampled rewrite failed: answer exactly rather than sending valid SQL to repair
+                exact = await self._run_sql(exact_sql, explain, False)
+                exact["meta"]["approximate"] = {"applied": False, "reason": f"sampled query failed: {str(e).strip()}"}
+                return exact
             ms = int((time.time() - t0) * 1000)
             return err_envelope(
                 sql=final_sql,
@@ -1,6 +1,8 @@
 from typing import Any, Dict, List, Optional
 import os
 
+from src.database.columnar import envelope_rows
+
 def _extract_columns_and_sample_rows(db_result: Dict[str, Any], max_sample: int = 10):
     """
     Extract columns + a small sample from the DB tool envelope.
@@ -11,9 +13,19 @@ def _extract_columns_and_sample_rows(db_result: Dict[str, Any], max_sample: int
         "data": {"columns": [...], "rows": [...], "row_count": n, "meta": {...}},
         "error": None
       }
+    Columnar envelopes ("values" instead of "rows") are handled too.
     """
     data = (db_result or {}).get("data") or {}
     columns = data.get("columns") or []
-    rows = data.get("rows") or []
-    sample_rows = rows[:max_sample]
-    return columns, sample_rows
\ No newline at end of file
+    sample_rows = envelope_rows(db_result, limit=max_sample)
+    return columns, sample_rows
+
+
+def _extract_column_meta(db_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Typed column metadata from the DB tool envelope:
+      [{"name": ..., "type": "int4", "category": "numeric", "nullable": None}, ...]
+    Present even when the result has no rows.
+    """
+    data = (db_result or {}).get("data") or {}
+    return data.get("column_meta") or []
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+from src.database.sql_policy import PolicyTokenizeError, Token, tokenize
+
+
+def enforce_limit_wrapper(sql: str, max_rows: int) -> str:
+    return f"SELECT * FROM ({sql}) AS _q LIMIT {int(max_rows)}"
+
+
+def _top_level(tokens: List[Token]) -> List[int]:
+    '''
+    Indices of tokens outside any parentheses.
+    '''
+    depth, top = 0, []
+    for i, t in enumerate(tokens):
+        if t.kind == "punct" and t.value == "(":
+            depth += 1
+        elif t.kind == "punct" and t.value == ")":
+            depth -= 1
+        elif depth == 0:
+            top.append(i)
+    return top
+
+
+def enforce_limit(sql: str, max_rows: int) -> Tuple[str, str]:
+    '''
+    Cap the statement at max_rows without hiding it inside a subquery.
+
+    Returns (sql, mode):
+      "kept"       top-level LIMIT already <= max_rows
+      "tightened"  top-level LIMIT literal lowered to max_rows
+      "appended"   no top-level LIMIT, one is appended
+      "wrapped"    fallback to SELECT * FROM (...) AS _q LIMIT n
+                   (LIMIT ALL / expressions / FETCH FIRST / unparsable SQL)
+    '''
+    max_rows = int(max_rows)
+    try:
+        tokens = tokenize(sql)
+    except PolicyTokenizeError:
+        return enforce_limit_wrapper(sql, max_rows), "wrapped"
+    if not tokens:
+        return enforce_limit_wrapper(sql, max_rows), "wrapped"
+
+    top = [tokens[i] for i in _top_level(tokens)]
+    if any(t.kind == "word" and t.value == "fetch" for t in top):
+        return enforce_limit_wrapper(sql, max_rows), "wrapped"
+
+    limit_at = [i for i, t in enumerate(top) if t.kind == "word" and t.value == "limit"]
+    if not limit_at:
+        # newline so a trailing "-- comment" cannot swallow the clause
+        return f"{sql}\nLIMIT {max_rows}", "appended"
+
+    value = top[limit_at[-1] + 1] if limit_at[-1] + 1 < len(top) else None
+    if value is None or value.kind != "number" or not value.value.isdigit():
+        return enforce_limit_wrapper(sql, max_rows), "wrapped"
+    if int(value.value) <= max_rows:
+        return sql, "kept"
+    return sql[:value.start] + str(max_rows) + sql[value.end:], "tightened"
+
+
+AGGREGATE_FUNCTIONS = frozenset({
+    "count", "sum", "avg", "min", "max", "bool_and", "bool_or", "every",
+    "string_agg", "array_agg", "json_agg", "jsonb_agg", "stddev", "stddev_pop",
+    "stddev_samp", "variance", "var_pop", "var_samp",
+})
+
+
+# Set-returning functions: in a select list they turn one aggregate row into many
+# (SELECT count(*), unnest(...)), so such statements keep the appended LIMIT.
+SET_RETURNING_FUNCTIONS = frozenset({
+    "unnest", "generate_series", "generate_subscripts", "regexp_matches",
+    "regexp_split_to_table", "string_to_table", "json_array_elements",
+    "json_array_elements_text", "jsonb_array_elements", "jsonb_array_elements_text",
+    "json_each", "json_each_text", "jsonb_each", "jsonb_each_text", "json_object_keys",
+    "jsonb_object_keys", "json_populate_recordset", "jsonb_populate_recordset",
+    "json_to_recordset", "jsonb_to_recordset", "jsonb_path_query", "ts_stat", "ts_debug",
+})
+
+
+def single_row_shape(sql: str) -> Optional[str]:
+    '''
+    Detect statements that return at most one row, which need neither a LIMIT nor
+    a full fetch.
+
+      "exists"     SELECT [NOT] EXISTS (...) without a FROM clause
+      "aggregate"  SELECT list with aggregate calls and no GROUP BY / set operation
+                   (no subqueries, window or set-returning functions in the select list)
+
+    Returns None for everything else (or when unsure).
+    '''
+    try:
+        tokens = tokenize(sql)
+    except PolicyTokenizeError:
+        return None
+    top = _top_level(tokens)
+    top_words = [tokens[i].value for i in top if tokens[i].kind == "word"]
+    if not top_words or top_words[0] != "select" or tokens[top[0]].value != "select":
+        return None
+    if any(w in top_words for w in ("group", "union", "intersect", "except", "fetch")):
+        return None
+
+    start = top[0] + 1
+    end = next((i for i in top if tokens[i].kind == "word" and tokens[i].value == "from"), len(tokens))
+    items = tokens[start:end]
+    if items and items[0].kind == "word" and items[0].value == "not":
+        items = items[1:]
+
+    if end == len(tokens):
+        if len(items) >= 2 and items[0].kind == "word" and items[0].value == "exists" and items[1].value == "(":
+            rest = [items[i] for i in _top_level(items)][1:]  # what follows EXISTS (...)
+            if rest and rest[0].kind == "word" and rest[0].value == "as":
+                rest = rest[1:]
+            if not rest or (len(rest) == 1 and rest[0].kind in ("word", "qident")):
+                return "exists"
+        return None
+
+    words = {t.value for t in items if t.kind == "word"}
+    if "select" in words or "over" in words:
+        return None
+    for i, t in enumerate(items[:-1]):
+        if t.kind in ("word", "qident") and t.value.lower() in SET_RETURNING_FUNCTIONS and items[i + 1].value == "(":
+            return None
+    for i, t in enumerate(items[:-1]):
+        if t.kind == "word" and t.value in AGGREGATE_FUNCTIONS and items[i + 1].value == "(":
+            return "aggregate"
+    return None
@@ -0,0 +1,421 @@
+'''
+Embedded SQLite backend for SupabaseDBToolAsync.
+
+database_url="sqlite:///data/northwind.db" (the file scripts/upload_northwind.py
+uploads to Supabase) runs the whole DB tool offline: no network, reproducible
+latencies for tests, evaluation and benchmarks.
+
+LocalPool / LocalConnection / LocalStatement mirror the parts of the asyncpg
+pool, connection and prepared-statement API the tool uses, so run_sql,
+fetch_page and stream_sql are unchanged. Generated SQL is PostgreSQL: it is
+translated once per prepared statement with sqlglot, plus the date functions
+sqlglot leaves PostgreSQL-only (EXTRACT, DATE_TRUNC, ::timestamp).
+'''
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.dialects.sqlite import SQLite
+
+from src.database.pool import PoolOverloaded
+from src.database.sql_policy import tokenize
+from src.database.statement_cache import ConnectionStatements
+
+LOCAL_URL_PREFIX = "sqlite:///"
+LOCAL_NORTHWIND_URL = "sqlite:///data/northwind.db"
+
+_EXPLAIN_PREFIX = "EXPLAIN (FORMAT JSON) "
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_ISO_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?$")
+_EXTRACT_FORMATS = {
+    "year": "%Y", "month": "%m", "day": "%d", "hour": "%H", "minute": "%M",
+    "second": "%S", "dow": "%w", "doy": "%j", "week": "%W", "epoch": "%s",
+}
+
+# sqlglot expression names that differ from the PostgreSQL function that produced them
+_PG_FUNCTION_NAMES = {"time_to_str": "to_char", "timestamp_trunc": "date_trunc", "group_concat": "string_agg"}
+
+
+def is_local_url(url: Optional[str]) -> bool:
+    return bool(url) and url.startswith(LOCAL_URL_PREFIX)
+
+
+class LocalSQLError(Exception):
+    '''
+    SQLite / translation errors, shaped like asyncpg.PostgresError
+    (sqlstate, hint, detail) so they become the same SQL_ERROR envelopes.
+    '''
+
+    def __init__(self, message: str, sqlstate: Optional[str] = None, hint: Optional[str] = None):
+        super().__init__(message)
+        self.sqlstate = sqlstate
+        self.hint = hint
+        self.detail = None
+
+
+def _sqlstate(message: str) -> Optional[str]:
+    message = message.lower()
+    if "no such column" in message:
+        return "42703"  # undefined_column
+    if "no such table" in message:
+        return "42P01"  # undefined_table
+    if "ambiguous column" in message:
+        return "42702"  # ambiguous_column
+    if "no such function" in message:
+        return "42883"  # undefined_function
+    if "syntax error" in message or "unrecognized token" in message:
+        return "42601"  # syntax_error
+    if "interrupted" in message:
+        return "57014"  # query_canceled (statement timeout)
+    if "readonly" in message or "read-only" in message:
+        return "25006"  # read_only_sql_transaction
+    return None
+
+
+def _date_trunc(unit: Optional[str], value: Optional[str]) -> Optional[str]:
+    if unit is None or value is None:
+        return None
+    ts = datetime.fromisoformat(str(value))
+    unit = unit.lower()
+    if unit == "year":
+        ts = ts.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    elif unit == "quarter":
+        ts = ts.replace(month=3 * ((ts.month - 1) // 3) + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    elif unit == "month":
+        ts = ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    elif unit == "week":
+        ts = datetime.fromordinal(ts.toordinal() - ts.weekday())
+    elif unit == "day":
+        ts = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif unit == "hour":
+        ts = ts.replace(minute=0, second=0, microsecond=0)
+    return ts.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _sqlite_casts(node: exp.Expression) -> exp.Expression:
+    if isinstance(node, exp.Cast) and node.to.this in (exp.DataType.Type.TIMESTAMP, exp.DataType.Type.TIMESTAMPTZ):
+        # CAST(... AS TIMESTAMP) has NUMERIC affinity in SQLite: '1997-01-01' -> 1997
+        return exp.func("DATETIME", node.this)
+    return node
+
+
+def _sqlite_functions(node: exp.Expression) -> exp.Expression:
+    if isinstance(node, exp.Extract):
+        unit = node.this.name.lower()
+        if unit == "quarter":
+            month = exp.cast(exp.func("STRFTIME", exp.Literal.string("%m"), node.expression), "INTEGER")
+            return exp.Paren(this=exp.Div(
+                this=exp.Paren(this=exp.Add(this=month, expression=exp.Literal.number(2))),
+                expression=exp.Literal.number(3),
+                typed=True,  # integer division
+            ))
+        if unit in _EXTRACT_FORMATS:
+            return exp.cast(exp.func("STRFTIME", exp.Literal.string(_EXTRACT_FORMATS[unit]), node.expression), "INTEGER")
+    if isinstance(node, (exp.DateTrunc, exp.TimestampTrunc)):
+        unit = node.args.get("unit")
+        return exp.Anonymous(this="date_trunc", expressions=[exp.Literal.string(unit.name.lower()), node.this])
+    if isinstance(node, exp.TimeToStr):
+        return exp.func("STRFTIME", node.args["format"], node.this)
+    return node
+
+
+def _default_column_names(tree: exp.Expression) -> None:
+    # PostgreSQL names an unaliased `count(*)` column "count"; SQLite would use "COUNT(*)"
+    if not isinstance(tree, exp.Select):
+        return
+    for i, item in enumerate(tree.expressions):
+        if isinstance(item, exp.Anonymous):
+            name = str(item.this).lower()
+        elif isinstance(item, exp.Func):
+            name = item.sql_name().lower()
+            name = _PG_FUNCTION_NAMES.get(name, name)
+        else:
+            continue
+        tree.expressions[i] = exp.alias_(item, name, quoted=True)
+
+
+def _bind_positional(sql: str) -> str:
+    # sqlglot's PostgreSQL reader does not parse $1 placeholders: swap them for
+    # identifiers and turn those into SQLite's ?NNN after translation.
+    out, last = [], 0
+    tokens = tokenize(sql)
+    for prev, tok in zip(tokens, tokens[1:]):
+        if prev.kind == "op" and prev.value == "$" and tok.kind == "number" and prev.end == tok.start:
+            out.append(sql[last:prev.start])
+            out.append(f"qm_param_{tok.value}")
+            last = tok.end
+    out.append(sql[last:])
+    return "".join(out)
+
+
+class _LocalSQLite(SQLite):
+    # Quote identifiers with backticks: SQLite reads an unknown "double-quoted"
+    # identifier as a string literal (PostgreSQL raises 42703), but never `this`.
+    class Tokenizer(SQLite.Tokenizer):
+        IDENTIFIERS = ["`", '"', ("[", "]")]
+        IDENTIFIER_ESCAPES = ["`"]
+
+
+@lru_cache(maxsize=1024)
+def to_sqlite(sql: str) -> str:
+    '''
+    PostgreSQL -> SQLite translation of one statement (memoized).
+    '''
+    try:
+        tree = sqlglot.parse_one(_bind_positional(sql), read="postgres")
+    except sqlglot.errors.SqlglotError as e:
+        raise LocalSQLError(str(e).strip(), sqlstate="42601") from None
+    if tree.find(exp.TableSample):
+        # sqlglot drops TABLESAMPLE for SQLite; scaled aggregates would be wrong
+        raise LocalSQLError("TABLESAMPLE is not supported by the local backend.", sqlstate="0A000")
+    _default_column_names(tree)
+    translated = tree.transform(_sqlite_casts).transform(_sqlite_functions).sql(dialect=_LocalSQLite)
+    return re.sub(r"\bqm_param_(\d+)\b", r"?\1", translated)
+
+
+class _Type(NamedTuple):
+    name: str
+
+
+class _Attribute(NamedTuple):
+    name: str
+    type: _Type
+
+
+def _infer_type(values: List[Any]) -> str:
+    '''
+    SQLite has no column types for expressions; use the first non-NULL value,
+    reporting PostgreSQL type names so column_meta categories match.
+    '''
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, bool):
+            return "bool"
+        if isinstance(v, int):
+            return "int8"
+        if isinstance(v, float):
+            return "float8"
+        if isinstance(v, bytes):
+            return "bytea"
+        if isinstance(v, str) and _ISO_DATE.match(v):
+            return "date"
+        if isinstance(v, str) and _ISO_TIMESTAMP.match(v):
+            return "timestamp"
+        return "text"
+    return "text"
+
+
+class LocalCursor:
+    def __init__(self, conn: "LocalConnection", cursor: sqlite3.Cursor):
+        self._conn = conn
+        self._cursor = cursor
+
+    async def fetch(self, n: int) -> List[sqlite3.Row]:
+        return await self._conn._run(self._cursor.fetchmany, n)
+
+
+class LocalStatement:
+    def __init__(self, conn: "LocalConnection", sql: str):
+        self._conn = conn
+        self.explain = sql.startswith(_EXPLAIN_PREFIX)
+        self.query = to_sqlite(sql[len(_EXPLAIN_PREFIX):] if self.explain else sql)
+        self._attributes: List[_Attribute] = []
+
+    def get_attributes(self) -> List[_Attribute]:
+        return self._attributes
+
+    def _describe(self, cursor: sqlite3.Cursor, rows: List[Any]) -> None:
+        names = [d[0] for d in cursor.description or ()]
+        self._attributes = [
+            _Attribute(name, _Type(_infer_type([r[i] for r in rows]))) for i, name in enumerate(names)
+        ]
+
+    def _fetch_all(self, args: tuple) -> List[Any]:
+        if self.explain:
+            # Same shape as EXPLAIN (FORMAT JSON); SQLite has no cost estimates, so
+            # plan_estimates() returns (None, None) and the cost gate admits.
+            details = [r[3] for r in self._conn._db.execute(f"EXPLAIN QUERY PLAN {self.query}", args)]
+            plan = [{"Plan": {"Node Type": "SQLite Query Plan", "Details": details}}]
+            return [{"QUERY PLAN": json.dumps(plan)}]
+        cursor = self._conn._db.execute(self.query, args)
+        rows = cursor.fetchall()
+        self._describe(cursor, rows)
+        return rows
+
+    async def fetch(self, *args: Any) -> List[Any]:
+        return await self._conn._run(self._fetch_all, args)
+
+    async def fetchrow(self, *args: Any) -> Optional[Any]:
+        rows = await self.fetch(*args)
+        return rows[0] if rows else None
+
+    async def cursor(self, *args: Any) -> LocalCursor:
+        cursor = await self._conn._run(self._conn._db.execute, self.query, args)
+        self._describe(cursor, [])
+        return LocalCursor(self._conn, cursor)
+
+
+class _NoTransaction:
+    # the database file is opened read-only; there is nothing to roll back
+    async def start(self) -> None:
+        pass
+
+    async def rollback(self) -> None:
+        pass
+
+
+async def _wait_for_worker(future: asyncio.Future) -> None:
+    while not future.done():
+        try:
+            await asyncio.wait({future})
+        except asyncio.CancelledError:
+            pass  # already cancelling
+    if not future.cancelled():
+        future.exception()  # the "interrupted" error nobody will look at
+
+
+class LocalConnection:
+    def __init__(self, db: sqlite3.Connection, statement_timeout_ms: int):
+        self._db = db
+        self._closed = False
+        self._timeout_s = statement_timeout_ms / 1000
+        self._deadline = float("inf")
+        self.prepared_statements = ConnectionStatements()
+        # statement_timeout: abort long-running statements from inside SQLite
+        db.set_progress_handler(lambda: 1 if time.monotonic() > self._deadline else 0, 10_000)
+
+    @classmethod
+    def open(cls, path: str, statement_timeout_ms: int) -> "LocalConnection":
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        if hasattr(db, "setconfig"):  # Python 3.12+: no "unknown identifier -> string literal" fallback
+            db.setconfig(sqlite3.SQLITE_DBCONFIG_DQS_DML, False)
+        db.row_factory = sqlite3.Row
+        db.create_function("date_trunc", 2, _date_trunc, deterministic=True)
+        return cls(db, statement_timeout_ms)
+
+    async def _run(self, fn, *args: Any) -> Any:
+        self._deadline = time.monotonic() + self._timeout_s
+        future = asyncio.get_running_loop().run_in_executor(None, fn, *args)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # like asyncpg's CancelRequest: stop the statement, keep the connection.
+            # The worker thread is inside SQLite until it notices the interrupt; wait
+            # for it so the pool never hands out a connection that is still busy.
+            self._db.interrupt()
+            await _wait_for_worker(future)
+            raise
+        except sqlite3.Error as e:
+            raise LocalSQLError(str(e), sqlstate=_sqlstate(str(e))) from None
+        finally:
+            self._deadline = float("inf")
+
+    async def prepare(self, sql: str) -> LocalStatement:
+        return LocalStatement(self, sql)
+
+    async def execute(self, sql: str) -> str:
+        # timeout_mode="transaction" prologue / ROLLBACK: read-only and timeouts are
+        # already enforced by the connection itself
+        return ""
+
+    def transaction(self, readonly: bool = True) -> _NoTransaction:
+        return _NoTransaction()
+
+    def is_in_transaction(self) -> bool:
+        return False
+
+    def is_closed(self) -> bool:
+        return self._closed
+
+    def close(self) -> None:
+        self._closed = True
+        self._db.close()
+
+
+_SCHEMA_SQL = (
+    "SELECT m.name, p.name, p.type FROM sqlite_master m, pragma_table_info(m.name) p "
+    "WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%' ORDER BY m.name, p.cid"
+)
+
+
+class LocalPool:
+    '''
+    Fixed set of read-only SQLite connections with the PoolRouter interface
+    (acquire / close / metrics). Queries run in worker threads, so the event
+    loop is never blocked.
+    '''
+
+    def __init__(self, path: str, connections: List[LocalConnection], acquire_timeout_s: float):
+        self.path = path
+        self._all = connections
+        self._idle: asyncio.Queue = asyncio.Queue()
+        for conn in connections:
+            self._idle.put_nowait(conn)
+        self.acquire_timeout_s = acquire_timeout_s
+        self.acquired = 0
+        self.timeouts = 0
+
+    @classmethod
+    async def create(cls, cfg: Any) -> "LocalPool":
+        path = cfg.database_url[len(LOCAL_URL_PREFIX):]
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Local database not found: {path}")
+        connections = [
+            LocalConnection.open(path, cfg.statement_timeout_ms) for _ in range(max(1, cfg.pool_max_size))
+        ]
+        return cls(path, connections, cfg.pool_acquire_timeout_ms / 1000)
+
+    @asynccontextmanager
+    async def acquire(self, read_only: bool = True):
+        try:
+            conn = await asyncio.wait_for(self._idle.get(), self.acquire_timeout_s)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise PoolOverloaded(
+                f"No connection available within {int(self.acquire_timeout_s * 1000)} ms."
+            ) from None
+        self.acquired += 1
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def close(self) -> None:
+        for conn in self._all:
+            conn.close()
+
+    async def schema(self) -> Dict[str, List[Dict[str, str]]]:
+        '''
+        table -> [{"column", "type"}] read from sqlite_master (there is no information_schema).
+        '''
+        async with self.acquire() as conn:
+            rows = await conn._run(lambda: conn._db.execute(_SCHEMA_SQL).fetchall())
+        schema: Dict[str, List[Dict[str, str]]] = {}
+        for table, column, dtype in rows:
+            schema.setdefault(table, []).append({"column": column, "type": dtype})
+        return schema
+
+    def metrics(self) -> Dict[str, Any]:
+        idle = self._idle.qsize()
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "size": len(self._all),
+            "in_use": len(self._all) - idle,
+            "idle": idle,
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+        }
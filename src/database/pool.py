@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+import asyncpg
+
+from src.database.statement_cache import StatementCachingConnection
+
+
+class PoolOverloaded(Exception):
+    '''
+    Raised instead of waiting when the acquire queue is full or the
+    per-request acquire deadline passes. run_sql turns it into an OVERLOADED envelope.
+    '''
+
+
+def _percentile(samples, pct: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class InstrumentedPool:
+    '''
+    asyncpg pool wrapper with a bounded admission queue and acquire metrics.
+
+    - at most max_queue_depth requests wait for a connection; further requests
+      are shed immediately with PoolOverloaded
+    - every waiter has a deadline (acquire_timeout_s) instead of waiting until
+      statement_timeout
+    - metrics(): acquire latency percentiles, in-use / idle connections, queue depth
+    '''
+
+    def __init__(self, pool: asyncpg.Pool, max_queue_depth: int, acquire_timeout_s: float, latency_window: int = 1024):
+        self._pool = pool
+        self.max_queue_depth = max_queue_depth
+        self.acquire_timeout_s = acquire_timeout_s
+        self._waiting = 0
+        self._in_use = 0
+        self._latencies_ms: deque = deque(maxlen=latency_window)
+        self.acquired = 0
+        self.shed = 0
+        self.timeouts = 0
+
+    @classmethod
+    async def create(
+        cls, cfg: Any, dsn: Optional[str] = None, server_settings: Optional[Dict[str, str]] = None
+    ) -> "InstrumentedPool":
+        pool = await asyncpg.create_pool(
+            dsn=dsn or cfg.database_url,
+            min_size=cfg.pool_min_size,
+            max_size=cfg.pool_max_size,
+            max_inactive_connection_lifetime=cfg.pool_max_idle_s,
+            server_settings=server_settings,
+            connection_class=StatementCachingConnection,
+        )
+        return cls(pool, cfg.pool_max_queue_depth, cfg.pool_acquire_timeout_ms / 1000)
+
+    @asynccontextmanager
+    async def acquire(self):
+        if self._waiting >= self.max_queue_depth and self._pool.get_idle_size() == 0:
+            self.shed += 1
+            raise PoolOverloaded(
+                f"Connection queue full ({self._waiting} waiting, {self._in_use} in use)."
+            )
+
+        t0 = time.perf_counter()
+        self._waiting += 1
+        try:
+            conn = await self._pool.acquire(timeout=self.acquire_timeout_s)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise PoolOverloaded(
+                f"No connection available within {int(self.acquire_timeout_s * 1000)} ms."
+            ) from None
+        finally:
+            self._waiting -= 1
+
+        self._latencies_ms.append((time.perf_counter() - t0) * 1000)
+        self.acquired += 1
+        self._in_use += 1
+        try:
+            yield conn
+        finally:
+            self._in_use -= 1
+            await self._pool.release(conn)
+
+    async def close(self) -> None:
+        await self._pool.close()
+
+    def metrics(self) -> Dict[str, Any]:
+        samples = list(self._latencies_ms)
+        return {
+            "size": self._pool.get_size(),
+            "min_size": self._pool.get_min_size(),
+            "max_size": self._pool.get_max_size(),
+            "in_use": self._in_use,
+            "idle": self._pool.get_idle_size(),
+            "queue_depth": self._waiting,
+            "max_queue_depth": self.max_queue_depth,
+            "acquired": self.acquired,
+            "shed": self.shed,
+            "timeouts": self.timeouts,
+            "acquire_ms_p50": _percentile(samples, 0.50),
+            "acquire_ms_p95": _percentile(samples, 0.95),
+            "acquire_ms_max": max(samples) if samples else None,
+        }
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from src.database.sql_policy import PolicyTokenizeError, tokenize
+from src.database.statement_cache import normalize_sql
+
+
+def query_fingerprint(sql: str) -> str:
+    '''
+    Statement text with literals replaced by "?" (pg_stat_statements style), so
+    `WHERE country = 'Germany'` and `WHERE country = 'France'` share one entry.
+    IN lists collapse to a single placeholder.
+    '''
+    try:
+        tokens = tokenize(sql)
+    except PolicyTokenizeError:
+        return normalize_sql(sql)
+
+    out: List[str] = []
+    for t in tokens:
+        if t.kind in ("string", "number"):
+            value = "?"
+        elif t.kind == "qident":
+            value = '"' + t.value.replace('"', '""') + '"'
+        else:
+            value = t.value
+        # "(?, ?, ?)" -> "(?)"
+        if value == "?" and len(out) >= 2 and out[-1] == "," and out[-2] == "?":
+            out.pop()
+            continue
+        out.append(value)
+    while out and out[-1] == ";":
+        out.pop()
+    return " ".join(out)
+
+
+def _percentile(samples, pct: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class QueryStat:
+    __slots__ = (
+        "query_id", "query", "calls", "errors", "cache_hits", "rows",
+        "total_ms", "max_ms", "samples", "first_seen", "last_seen",
+    )
+
+    def __init__(self, query_id: str, query: str, sample_size: int):
+        self.query_id = query_id
+        self.query = query
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples: deque = deque(maxlen=sample_size)
+        self.first_seen = self.last_seen = time.time()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "query_id": self.query_id,
+            "query": self.query,
+            "calls": self.calls,
+            "errors": self.errors,
+            "cache_hits": self.cache_hits,
+            "rows": self.rows,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.calls, 3) if self.calls else None,
+            "p95_ms": _percentile(self.samples, 0.95),
+            "max_ms": self.max_ms,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+        }
+
+
+class QueryStatsRegistry:
+    '''
+    In-process pg_stat_statements for run_sql: fingerprint -> calls, time, rows,
+    errors, cache hits.
+
+    - no locks: record() never awaits, so on the event loop every update is atomic
+    - bounded: at most max_entries fingerprints; when full, the least-called 5% are
+      evicted in one pass (like pg_stat_statements' dealloc) so eviction is rare
+    - p95 comes from the last sample_size timings of each fingerprint
+    '''
+
+    def __init__(self, max_entries: int = 500, sample_size: int = 128):
+        self.max_entries = max_entries
+        self.sample_size = sample_size
+        self._stats: Dict[str, QueryStat] = {}
+        self.evicted = 0
+        self.deallocs = 0
+        self.since = time.time()
+
+    def _evict(self) -> None:
+        n = max(1, self.max_entries // 20)
+        victims = sorted(self._stats.values(), key=lambda s: (s.calls, s.total_ms))[:n]
+        for s in victims:
+            del self._stats[s.query_id]
+        self.evicted += len(victims)
+        self.deallocs += 1
+
+    def record(
+        self, sql: str, execution_ms: Optional[float], rows: int = 0, ok: bool = True, cache_hit: bool = False
+    ) -> None:
+        if self.max_entries <= 0:
+            return
+        query = query_fingerprint(sql)
+        query_id = hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
+        stat = self._stats.get(query_id)
+        if stat is None:
+            if len(self._stats) >= self.max_entries:
+                self._evict()
+            stat = self._stats[query_id] = QueryStat(query_id, query, self.sample_size)
+
+        ms = float(execution_ms or 0)
+        stat.calls += 1
+        stat.total_ms += ms
+        stat.max_ms = max(stat.max_ms, ms)
+        stat.samples.append(ms)
+        stat.rows += rows or 0
+        stat.last_seen = time.time()
+        if not ok:
+            stat.errors += 1
+        if cache_hit:
+            stat.cache_hits += 1
+
+    def record_envelope(self, sql: str, envelope: Dict[str, Any]) -> None:
+        meta = envelope.get("meta") or {}
+        self.record(
+            sql,
+            meta.get("execution_ms"),
+            rows=(envelope.get("data") or {}).get("row_count") or 0,
+            ok=bool(envelope.get("ok")),
+            cache_hit=bool(meta.get("cache_hit")),
+        )
+
+    def top(self, order_by: str = "total_ms", limit: int = 20) -> List[Dict[str, Any]]:
+        rows = [s.as_dict() for s in list(self._stats.values())]
+        rows.sort(key=lambda r: r.get(order_by) or 0, reverse=True)
+        return rows[:limit]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "tracked": len(self._stats),
+            "max_entries": self.max_entries,
+            "evicted": self.evicted,
+            "deallocs": self.deallocs,
+            "since": self.since,
+        }
+
+    def reset(self) -> None:
+        self._stats.clear()
+        self.evicted = 0
+        self.deallocs = 0
+        self.since = time.time()
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from src.database.statement_cache import normalize_sql
+
+
+def result_cache_key(sql: str, cfg: Any) -> str:
+    '''
+    Same SQL under different limits can produce different envelopes,
+    so the DBToolConfig knobs that shape the result are part of the key.
+    '''
+    return "|".join([
+        normalize_sql(sql),
+        f"max_rows={getattr(cfg, 'max_rows', None)}",
+        f"enforce_limit={getattr(cfg, 'enforce_limit', None)}",
+        f"multi={getattr(cfg, 'allow_multi_statement', None)}",
+        f"format={getattr(cfg, 'result_format', None)}",
+    ])
+
+
+def estimate_envelope_bytes(envelope: Dict[str, Any]) -> int:
+    return len(json.dumps(envelope.get("data"), default=str))
+
+
+class ResultCache(ABC):
+    '''
+    Interface for result caches plugged into SupabaseDBToolAsync.
+    Implementations store whole ok envelopes keyed by result_cache_key().
+    '''
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, envelope: Dict[str, Any], ttl_s: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def invalidate(self) -> None:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+@dataclass
+class _Entry:
+    envelope: Dict[str, Any]
+    expires_at: float
+    size: int
+
+
+class TTLLRUResultCache(ResultCache):
+    '''
+    In-process cache bounded by entry count AND total (approximate) bytes.
+    Every entry carries its own expiry; expired entries are dropped on read.
+    '''
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024, default_ttl_s: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl_s = default_ttl_s
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.envelope
+
+    def set(self, key: str, envelope: Dict[str, Any], ttl_s: Optional[float] = None) -> None:
+        size = estimate_envelope_bytes(envelope)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+
+        ttl = self.default_ttl_s if ttl_s is None else ttl_s
+        self._entries[key] = _Entry(envelope=envelope, expires_at=time.monotonic() + ttl, size=size)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest, _ = next(iter(self._entries.items()))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def invalidate(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def _copy_data(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    # new containers down to the rows / value lists; the cell values are immutable scalars
+    if data is None:
+        return None
+    copied = dict(data)
+    if data.get("rows") is not None:
+        copied["rows"] = [dict(r) for r in data["rows"]]
+    if data.get("values") is not None:
+        copied["values"] = {c: list(v) for c, v in data["values"].items()}
+    if data.get("columns") is not None:
+        copied["columns"] = list(data["columns"])
+    if data.get("column_meta") is not None:
+        copied["column_meta"] = [dict(c) for c in data["column_meta"]]
+    return copied
+
+
+def as_cache_hit(envelope: Dict[str, Any], elapsed_ms: int) -> Dict[str, Any]:
+    '''
+    Copy of a cached envelope with cache_hit set. The data containers are copied
+    too, so callers may modify the result without corrupting the cache entry.
+    '''
+    hit = dict(envelope)
+    hit["data"] = _copy_data(envelope.get("data"))
+    hit["meta"] = {**(envelope.get("meta") or {}), "cache_hit": True, "execution_ms": elapsed_ms}
+    return hit
+
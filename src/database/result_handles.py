@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import base64
+import json
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dtime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from src.database.limit_enforcer import _top_level
+from src.database.sql_policy import PolicyTokenizeError, Token, tokenize
+
+
+@dataclass
+class ResultHandle:
+    result_id: str
+    sql: str
+    columns: List[str]
+    created_at: float
+    column_meta: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class ResultHandleStore:
+    '''
+    Maps result ids handed out by /chat to the SQL that produced them, so later
+    pages can be read without re-running the LLM pipeline.
+    Bounded by entry count (LRU) and a TTL.
+    '''
+
+    def __init__(self, max_entries: int = 1024, ttl_s: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._handles: "OrderedDict[str, ResultHandle]" = OrderedDict()
+
+    def create(
+        self, sql: str, columns: Optional[List[str]] = None, column_meta: Optional[List[Dict[str, Any]]] = None
+    ) -> str:
+        result_id = uuid.uuid4().hex
+        self._handles[result_id] = ResultHandle(
+            result_id, sql, list(columns or []), time.monotonic(), list(column_meta or [])
+        )
+        while len(self._handles) > self.max_entries:
+            self._handles.popitem(last=False)
+        return result_id
+
+    def get(self, result_id: str) -> Optional[ResultHandle]:
+        handle = self._handles.get(result_id)
+        if handle is None:
+            return None
+        if time.monotonic() - handle.created_at > self.ttl_s:
+            del self._handles[result_id]
+            return None
+        self._handles.move_to_end(result_id)
+        return handle
+
+
+# Output column types a keyset page can order and compare on. Cursors carry the
+# key values as text; the page SQL casts them back ($1::text::<type>).
+KEYSET_TYPES = frozenset({
+    "int2", "int4", "int8", "float4", "float8", "numeric", "text", "varchar", "bpchar",
+    "name", "date", "time", "timestamp", "timestamptz", "bool", "uuid",
+})
+
+# A page position: a key (list of key texts) for keyset pages, else a row number (0 = start).
+PagePosition = Union[int, List[Optional[str]]]
+
+
+class PageKey(NamedTuple):
+    column: str
+    type: str
+    desc: bool = False
+    nulls_first: bool = False  # PostgreSQL default: NULLS LAST for ASC, FIRST for DESC
+
+
+def encode_cursor(position: PagePosition) -> str:
+    data = {"key": position} if isinstance(position, list) else {"after": position}
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> PagePosition:
+    '''
+    Opaque cursor -> last key (keyset pages) or last row number already returned (0 = start).
+    Raises ValueError for malformed cursors.
+    '''
+    if not cursor:
+        return 0
+    data: Dict[str, Any] = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    if "key" in data:
+        key = data["key"]
+        if not isinstance(key, list) or not all(v is None or isinstance(v, str) for v in key):
+            raise ValueError("malformed cursor key")
+        return key
+    after = int(data["after"])
+    if after < 0:
+        raise ValueError("negative cursor")
+    return after
+
+
+def key_text(value: Any) -> Optional[str]:
+    '''
+    A key value as text PostgreSQL parses back to the same value.
+    '''
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, (datetime, date, dtime)):
+        return value.isoformat()
+    return str(value)
+
+
+def row_key(keys: List["PageKey"], columns: List[str], row: Sequence[Any]) -> List[Optional[str]]:
+    '''
+    The page key of a result row (in key order, as text): what a cursor carries.
+    '''
+    return [key_text(row[columns.index(k.column)]) for k in keys]
+
+
+def _split_top(tokens: List[Token]) -> List[List[Token]]:
+    # comma-separated items outside parentheses
+    items: List[List[Token]] = [[]]
+    top = set(_top_level(tokens))
+    for i, t in enumerate(tokens):
+        if i in top and t.kind == "punct" and t.value == ",":
+            items.append([])
+        else:
+            items[-1].append(t)
+    return items
+
+
+def _shape(tokens: Sequence[Token]) -> Tuple[Tuple[str, str], ...]:
+    return tuple((t.kind, t.value) for t in tokens)
+
+
+def _select_items(tokens: List[Token], top: List[int]) -> Optional[List[Tuple[Tuple[str, str], ...]]]:
+    '''
+    Expression shapes (alias removed) of the first top-level SELECT list, or None.
+    '''
+    if not top or not (tokens[top[0]].kind == "word" and tokens[top[0]].value == "select"):
+        return None
+    start = top[0] + 1
+    end = next((i for i in top if tokens[i].kind == "word" and tokens[i].value == "from"), len(tokens))
+    if start < end and tokens[start].kind == "word" and tokens[start].value in ("distinct", "all"):
+        return None  # DISTINCT [ON (...)]: not worth untangling, output names still map
+    shapes = []
+    for item in _split_top(tokens[start:end]):
+        if len(item) >= 3 and item[-2].kind == "word" and item[-2].value == "as":
+            item = item[:-2]
+        elif len(item) >= 2 and item[-1].kind in ("word", "qident") and item[-2].value != ".":
+            item = item[:-1]  # implicit alias: count(*) n
+        shapes.append(_shape(item))
+    return shapes
+
+
+def _order_by(tokens: List[Token], top: List[int]) -> Optional[List[Tuple[List[Token], bool, bool]]]:
+    '''
+    [(expression tokens, desc, nulls_first)] of the statement's top-level ORDER BY
+    ([] without one), or None when it cannot be read (USING operators ...).
+    '''
+    at = [j for j, i in enumerate(top[:-1])
+          if tokens[i].kind == "word" and tokens[i].value == "order"
+          and tokens[top[j + 1]].kind == "word" and tokens[top[j + 1]].value == "by"]
+    if not at:
+        return []
+    begin = top[at[-1] + 1] + 1
+    end = next(
+        (i for i in top if i >= begin and tokens[i].kind == "word" and tokens[i].value in ("limit", "offset", "fetch", "for")),
+        len(tokens),
+    )
+    items = []
+    for item in _split_top(tokens[begin:end]):
+        desc, nulls_first = False, None
+        words = [t.value if t.kind == "word" else None for t in item]
+        if words[-2:] in (["nulls", "first"], ["nulls", "last"]):
+            nulls_first, item, words = words[-1] == "first", item[:-2], words[:-2]
+        if words[-1:] in (["asc"], ["desc"]):
+            desc, item = words[-1] == "desc", item[:-1]
+        if not item or any(t.kind == "word" and t.value == "using" for t in item):
+            return None
+        items.append((item, desc, desc if nulls_first is None else nulls_first))
+    return items
+
+
+def page_keys(sql: str, column_meta: Sequence[Dict[str, Any]]) -> Optional[List[PageKey]]:
+    '''
+    A total order over the statement's output for keyset pages: its own ORDER BY
+    keys first, then every other output column as a tie-breaker. Only rows equal
+    in every column tie, and those are interchangeable.
+
+    None when keyset paging is not possible: unnamed / duplicate / unorderable
+    output columns, or ORDER BY keys that are not output columns.
+    '''
+    names = [c.get("name") for c in column_meta]
+    types = [c.get("type") for c in column_meta]
+    if not names or None in names or len(set(names)) != len(names) or any(t not in KEYSET_TYPES for t in types):
+        return None
+    try:
+        tokens = tokenize(sql)
+    except PolicyTokenizeError:
+        return None
+    top = _top_level(tokens)
+    order = _order_by(tokens, top)
+    if order is None:
+        return None
+
+    select = _select_items(tokens, top)
+    keys: List[PageKey] = []
+    for item, desc, nulls_first in order:
+        index = None
+        if len(item) == 1 and item[0].kind == "number" and item[0].value.isdigit():
+            index = int(item[0].value) - 1  # ORDER BY 2
+        elif len(item) == 1 and item[0].kind in ("word", "qident") and item[0].value in names:
+            index = names.index(item[0].value)  # output column name / alias
+        elif select is not None and len(select) == len(names) and _shape(item) in select:
+            index = select.index(_shape(item))  # same expression as a select item
+        if index is None or not 0 <= index < len(names):
+            return None
+        if all(k.column != names[index] for k in keys):
+            keys.append(PageKey(names[index], types[index], desc, nulls_first))
+    for name, type_ in zip(names, types):
+        if all(k.column != name for k in keys):
+            keys.append(PageKey(name, type_))
+    return keys
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _after(keys: List[PageKey]) -> str:
+    # rows strictly after the key $1..$n in ORDER BY order, NULL placement included
+    ors = []
+    for i, key in enumerate(keys):
+        col, value = f"_q.{_quote(key.column)}", f"${i + 1}::text::{key.type}"
+        op = "<" if key.desc else ">"
+        if key.nulls_first:
+            after = f"(CASE WHEN {value} IS NULL THEN {col} IS NOT NULL ELSE {col} {op} {value} END)"
+        else:
+            after = f"({value} IS NOT NULL AND ({col} {op} {value} OR {col} IS NULL))"
+        equal = [f"_q.{_quote(k.column)} IS NOT DISTINCT FROM ${j + 1}::text::{k.type}" for j, k in enumerate(keys[:i])]
+        ors.append("(" + " AND ".join(equal + [after]) + ")")
+    return " OR ".join(ors)
+
+
+def _key_equals(keys: List[PageKey]) -> str:
+    return " AND ".join(
+        f"_q.{_quote(k.column)} IS NOT DISTINCT FROM ${i + 1}::text::{k.type}" for i, k in enumerate(keys)
+    )
+
+
+def keyset_page_sql(sql: str, keys: List[PageKey], after_key: bool) -> str:
+    '''
+    Page query ordered on keys: with after_key, $1..$n are the last key already
+    returned (as text) and $n+1 the page size + 1; otherwise (first page) $1 is.
+
+    The page boundary is a WHERE on the key, so PostgreSQL skips earlier rows
+    instead of numbering and discarding them (and can use an index on the key).
+    The text depends only on the keys, so each statement is prepared once.
+    '''
+    order = ", ".join(
+        f"_q.{_quote(k.column)} {'DESC' if k.desc else 'ASC'} NULLS {'FIRST' if k.nulls_first else 'LAST'}"
+        for k in keys
+    )
+    where = f" WHERE {_after(keys)}" if after_key else ""
+    limit = f"${len(keys) + 1}" if after_key else "$1"
+    return f"SELECT _q.* FROM ({sql}) AS _q{where} ORDER BY {order} LIMIT {limit}"
+
+
+def key_count_sql(sql: str, keys: List[PageKey]) -> str:
+    '''
+    Rows whose key equals $1..$n: identical rows straddling a page boundary are
+    returned together, since a key cannot tell them apart.
+    '''
+    return f"SELECT count(*) FROM ({sql}) AS _q WHERE {_key_equals(keys)}"
+
+
+def row_number_page_sql(sql: str) -> str:
+    '''
+    Fallback page query for results page_keys() cannot key ($1 = last row number
+    seen, $2 = page size + 1). Every page numbers the result from the start, and
+    without an ORDER BY in the statement the row order is not guaranteed.
+    '''
+    return (
+        'SELECT * FROM ('
+        f'SELECT _q.*, row_number() OVER () AS "_qm_row" FROM ({sql}) AS _q'
+        ') AS _p WHERE "_qm_row" > $1 ORDER BY "_qm_row" LIMIT $2'
+    )
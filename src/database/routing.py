@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from src.database.pool import InstrumentedPool, PoolOverloaded
+
+# Seconds the replica is behind; 0 on a primary or a fully caught-up replica
+# (replay timestamp alone would grow on an idle primary).
+REPLICA_LAG_SQL = """
+SELECT CASE
+  WHEN NOT pg_is_in_recovery() THEN 0
+  WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+  ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+@dataclass
+class RoutedPool:
+    name: str
+    role: str  # "primary" | "replica"
+    pool: Optional[InstrumentedPool]  # None until a replica that was down at boot is reached
+    dsn: Optional[str] = None
+    outstanding: int = 0
+    healthy: bool = True
+    lag_s: float = 0.0
+    last_error: Optional[str] = None
+
+
+class PoolRouter:
+    '''
+    Routes connections across a primary and optional read replicas.
+
+    Read-only work goes to the healthy replica with the fewest outstanding
+    requests (least-outstanding-requests) whose lag is within max_replica_lag_s;
+    if none qualifies it falls back to the primary. A background task re-checks
+    health and lag every health_check_interval_s. A replica that cannot be reached
+    at startup starts unhealthy; the health check keeps trying to connect it.
+
+    With no replicas configured this behaves exactly like the single primary pool.
+    To try it locally, run two PostgreSQL instances (a streaming replica, or just a
+    second copy of Northwind) and pass the second DSN in DBToolConfig.replica_urls.
+    '''
+
+    def __init__(self, primary: RoutedPool, replicas: List[RoutedPool], max_replica_lag_s: float, health_check_interval_s: float):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_replica_lag_s = max_replica_lag_s
+        self.health_check_interval_s = health_check_interval_s
+        self._health_task: Optional[asyncio.Task] = None
+        self._cfg: Any = None
+        self._server_settings: Optional[Dict[str, str]] = None
+
+    @classmethod
+    async def create(cls, cfg: Any, server_settings: Optional[Dict[str, str]] = None) -> "PoolRouter":
+        primary = RoutedPool("primary", "primary", await InstrumentedPool.create(cfg, server_settings=server_settings))
+        replicas = [RoutedPool(f"replica_{i}", "replica", None, dsn=dsn) for i, dsn in enumerate(cfg.replica_urls)]
+
+        router = cls(primary, replicas, cfg.max_replica_lag_s, cfg.health_check_interval_s)
+        router._cfg, router._server_settings = cfg, server_settings
+        if replicas:
+            await router.check_health()
+            router._health_task = asyncio.create_task(router._health_loop())
+        return router
+
+    def nodes(self) -> List[RoutedPool]:
+        return [self.primary] + self.replicas
+
+    def choose(self, read_only: bool = True) -> RoutedPool:
+        if read_only:
+            candidates = [r for r in self.replicas if r.healthy and r.lag_s <= self.max_replica_lag_s]
+            if candidates:
+                return min(candidates, key=lambda r: r.outstanding)
+        return self.primary
+
+    @asynccontextmanager
+    async def acquire(self, read_only: bool = True):
+        node = self.choose(read_only)
+        node.outstanding += 1
+        try:
+            async with node.pool.acquire() as conn:
+                yield conn
+        finally:
+            node.outstanding -= 1
+
+    async def _connect(self, node: RoutedPool) -> None:
+        '''
+        Opens the replica's pool; a replica that is down stays unhealthy (the app
+        still starts on the primary) and is retried by the next health check.
+        '''
+        try:
+            node.pool = await InstrumentedPool.create(self._cfg, dsn=node.dsn, server_settings=self._server_settings)
+        except Exception as e:
+            node.healthy = False
+            node.last_error = str(e) or type(e).__name__
+
+    async def _check_node(self, node: RoutedPool) -> None:
+        if node.pool is None:
+            await self._connect(node)
+            if node.pool is None:
+                return
+        try:
+            async with node.pool.acquire() as conn:
+                lag = await conn.fetchval(REPLICA_LAG_SQL, timeout=self.health_check_interval_s)
+            node.lag_s = float(lag or 0)
+            node.healthy = True
+            node.last_error = None
+        except (PoolOverloaded, asyncio.TimeoutError) as e:
+            # busy is not unhealthy; keep the previous verdict
+            node.last_error = str(e) or type(e).__name__
+        except Exception as e:
+            node.healthy = False
+            node.last_error = str(e) or type(e).__name__
+
+    async def check_health(self) -> None:
+        await asyncio.gather(*(self._check_node(r) for r in self.replicas))
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_check_interval_s)
+            await self.check_health()
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+        await asyncio.gather(*(n.pool.close() for n in self.nodes() if n.pool is not None))
+
+    def metrics(self) -> Dict[str, Any]:
+        nodes = {
+            n.name: {
+                "role": n.role,
+                "healthy": n.healthy,
+                "lag_s": n.lag_s,
+                "outstanding": n.outstanding,
+                "last_error": n.last_error,
+                **(n.pool.metrics() if n.pool is not None else {}),
+            }
+            for n in self.nodes()
+        }
+        return {**self.primary.pool.metrics(), "nodes": nodes}
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+
+from src.database.sql_policy import PolicyTokenizeError, Token, _skip_parens, tokenize
+
+# Words that can follow a table reference but are not an alias.
+_NOT_ALIAS = frozenset({
+    "where", "join", "inner", "left", "right", "full", "cross", "natural", "on", "using",
+    "group", "order", "having", "limit", "offset", "union", "intersect", "except",
+    "window", "fetch", "for", "tablesample", "lateral",
+})
+
+
+# Aggregates whose sampled value estimates the exact one (scaled or not).
+_SCALABLE_AGGREGATES = frozenset({"count", "sum", "avg"})
+
+
+@dataclass(frozen=True)
+class SampledQuery:
+    sql: str
+    table: str
+    sample_pct: float
+    scale: float
+
+    def as_meta(self) -> dict:
+        return {"sampled_table": self.table, "sample_pct": self.sample_pct, "scale": self.scale}
+
+
+def _table_name(tok: Token) -> Optional[str]:
+    if tok.kind == "word":
+        return tok.value
+    if tok.kind == "qident":
+        return tok.value.lower()
+    return None
+
+
+def sample_rewrite(
+    sql: str, large_tables: Sequence[str], sample_pct: float, method: str = "SYSTEM"
+) -> Tuple[Optional[SampledQuery], Optional[str]]:
+    '''
+    Rewrite one scan of a large table to TABLESAMPLE and scale COUNT/SUM by 100/pct.
+
+    Only single-level aggregate SELECTs (COUNT / SUM / AVG; no subqueries, CTEs or
+    window functions) are rewritten, so every scaled aggregate is known to run over
+    the sampled scan; AVG/MIN/MAX are left as is. Plain row queries (ORDER BY ...
+    LIMIT n and the like) would just return an arbitrary subset of the rows. Only the first listed large table found is sampled: sampling two
+    joined tables would bias the join.
+
+    Returns (SampledQuery, None) or (None, reason the query must run exactly).
+    '''
+    try:
+        tokens = tokenize(sql)
+    except PolicyTokenizeError as e:
+        return None, str(e)
+
+    words = [t.value for t in tokens if t.kind == "word"]
+    if words.count("select") != 1 or "with" in words:
+        return None, "subqueries / CTEs are not sampled"
+    if "over" in words:
+        return None, "window functions are not sampled"
+    if "tablesample" in words:
+        return None, "query already samples"
+    if not any(
+        t.kind == "word" and t.value in _SCALABLE_AGGREGATES and tokens[i + 1].value == "("
+        for i, t in enumerate(tokens[:-1])
+    ):
+        return None, "only aggregate queries (COUNT / SUM / AVG) are sampled"
+    for i, t in enumerate(tokens[:-2]):
+        if t.kind == "word" and t.value == "count" and tokens[i + 2].kind == "word" and tokens[i + 2].value == "distinct":
+            return None, "COUNT(DISTINCT ...) cannot be scaled"
+
+    # table references: the token right after FROM / JOIN / a comma in the FROM list
+    refs = {}
+    in_from = False
+    for i, t in enumerate(tokens):
+        if t.kind == "word" and t.value in ("from", "join"):
+            in_from = t.value == "from" or in_from
+            nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+            if nxt is not None and _table_name(nxt) and not (i + 2 < len(tokens) and tokens[i + 2].value in (".", "(")):
+                refs.setdefault(_table_name(nxt), i + 1)
+        elif t.kind == "word" and t.value in ("where", "group", "order", "having", "limit"):
+            in_from = False
+        elif in_from and t.kind == "punct" and t.value == "," and i + 1 < len(tokens) and _table_name(tokens[i + 1]):
+            refs.setdefault(_table_name(tokens[i + 1]), i + 1)
+
+    target = next((name for name in large_tables if name.lower() in refs), None)
+    if target is None:
+        return None, "no large table scanned"
+
+    # TABLESAMPLE goes after the optional alias
+    at = refs[target.lower()]
+    end = tokens[at].end
+    nxt = at + 1
+    if nxt < len(tokens) and tokens[nxt].kind == "word" and tokens[nxt].value == "as":
+        nxt += 1
+    if nxt < len(tokens) and _table_name(tokens[nxt]) and not (
+        tokens[nxt].kind == "word" and tokens[nxt].value in _NOT_ALIAS
+    ):
+        end = tokens[nxt].end
+
+    scale = round(100.0 / sample_pct, 6)
+    edits = [(end, end, f" TABLESAMPLE {method} ({sample_pct:g})")]
+    for i, t in enumerate(tokens[:-1]):
+        if t.kind == "word" and t.value in ("count", "sum") and tokens[i + 1].value == "(":
+            after = _skip_parens(tokens, i + 1)
+            close = tokens[after - 1]
+            original = sql[t.start:close.end]
+            if t.value == "count":
+                scaled = f"round({original} * {scale})::bigint"
+            else:
+                scaled = f"({original} * {scale})"
+            # keep the output column name of a bare select-list aggregate
+            prev = tokens[i - 1] if i else None
+            nxt = tokens[after] if after < len(tokens) else None
+            if prev is not None and prev.value in ("select", ",") and (nxt is None or nxt.value in (",", "from")):
+                scaled += f" AS {t.value}"
+            edits.append((t.start, close.end, scaled))
+
+    out = sql
+    for start, stop, text in sorted(edits, key=lambda e: e[0], reverse=True):
+        out = out[:start] + text + out[stop:]
+    return SampledQuery(out, target, sample_pct, scale), None
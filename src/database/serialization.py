@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+
+import asyncpg
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback, same output, slower
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    '''
+    Types the encoder does not know natively. orjson already writes datetime /
+    date / time / UUID itself; the stdlib fallback needs them here.
+    '''
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, asyncpg.Record):
+        return dict(obj.items())
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, UUID):
+        return str(obj)
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return bytes(obj).hex()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    '''
+    Encode a DB envelope (or any JSON-like value holding Decimal / date / Record
+    values) straight to UTF-8 JSON bytes, without a jsonable_encoder pass.
+    '''
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def to_jsonable(obj: Any) -> Any:
+    '''
+    Plain JSON types only (Decimal -> float, dates -> ISO strings), e.g. before
+    building DataFrames for comparison.
+    '''
+    if orjson is not None:
+        return orjson.loads(dumps(obj))
+    return json.loads(dumps(obj))
@@ -0,0 +1,266 @@
+'''
+Read-only SQL policy check built on a small PostgreSQL tokenizer.
+
+Unlike keyword regexes, the tokenizer knows about string literals (incl. E'' and
+$$ dollar quotes), quoted identifiers and comments, so `WHERE "Notes" = 'do not call'`
+or a column named "comment" no longer look like forbidden statements.
+Statement verbs are only checked where a statement can actually start: the
+beginning of the SQL and the first word inside a subquery / CTE body.
+'''
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+
+class Token(NamedTuple):
+    kind: str  # word | qident | string | number | punct | op
+    value: str  # words are lowercased
+    start: int = -1  # offsets into the original SQL
+    end: int = -1
+
+
+# Verbs that start a non-SELECT statement (also inside data-modifying CTEs).
+FORBIDDEN_STATEMENTS = frozenset({
+    "insert", "update", "delete", "merge", "drop", "alter", "truncate", "create",
+    "grant", "revoke", "comment", "vacuum", "analyze", "cluster", "copy", "do",
+    "call", "execute", "listen", "notify", "prepare", "deallocate", "lock",
+    "set", "reset", "refresh", "reindex", "discard", "import",
+})
+
+# Functions with side effects or server access.
+FORBIDDEN_FUNCTIONS = frozenset({
+    "pg_sleep", "pg_sleep_for", "pg_sleep_until", "pg_terminate_backend",
+    "pg_cancel_backend", "pg_reload_conf", "pg_read_file", "pg_read_binary_file",
+    "pg_ls_dir", "lo_import", "lo_export", "dblink", "dblink_exec", "set_config",
+    # run an arbitrary query string (or dump whole schemas) past the statement checks
+    "query_to_xml", "query_to_xmlschema", "query_to_xml_and_xmlschema", "cursor_to_xml",
+    "cursor_to_xmlschema", "table_to_xml", "table_to_xmlschema", "table_to_xml_and_xmlschema",
+    "schema_to_xml", "schema_to_xml_and_xmlschema", "database_to_xml", "database_to_xml_and_xmlschema",
+})
+
+# A "(" right after one of these (or after punctuation/operators) opens a subquery;
+# after any other word it is a function call or a column list.
+_SUBQUERY_OPENERS = frozenset({
+    "as", "from", "join", "in", "exists", "any", "all", "some", "lateral", "union",
+    "intersect", "except", "select", "where", "and", "or", "not", "on", "with",
+    "materialized", "then", "else", "when", "having", "by", "recursive",
+})
+
+
+# Words that continue an expression: `(comment IS NULL)` is a column named comment,
+# not a COMMENT statement.
+_EXPRESSION_WORDS = frozenset({
+    "is", "isnull", "notnull", "and", "or", "not", "in", "between", "like", "ilike",
+    "similar", "collate", "as", "asc", "desc", "nulls", "over", "filter", "at",
+})
+
+
+class PolicyTokenizeError(ValueError):
+    pass
+
+
+# One compiled scanner; leading whitespace is folded into every token so the loop
+# only sees significant tokens. Nested /* */ comments are not tracked: the tail of
+# an outer comment is scanned as code, which can only cause a false rejection.
+_TOKEN_RE = re.compile(
+    r"""
+    \s*(?:
+        (?P<comment>--[^\n]*|/\*.*?\*/)
+        |(?P<string>
+            [eE]'(?:[^'\\]|\\.|'')*'
+            |(?:[bBxXnN]|[uU]&)?'(?:[^']|'')*'
+            |\$(?P<tag>[A-Za-z_][A-Za-z0-9_]*|)\$.*?\$(?P=tag)\$
+        )
+        |(?P<qident>(?:[uU]&)?"(?:[^"]|"")*")
+        |(?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+        |(?P<number>\.?\d[\w.]*)
+        |(?P<punct>[(),;.\[\]])
+        |(?P<op>[+\-*/<>=~!@#%^&|`?:$]+|.)
+    )
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+
+_UNICODE_ESCAPE_RE = re.compile(r"\\(?:\\|\+([0-9A-Fa-f]{6})|([0-9A-Fa-f]{4}))")
+
+
+def _unicode_escapes(text: str) -> str:
+    # U&"\0070g_sleep" is "pg_sleep"; a custom UESCAPE character is rejected in _forbidden
+    def sub(m) -> str:
+        code = m.group(1) or m.group(2)
+        return chr(int(code, 16)) if code else "\\"
+    return _UNICODE_ESCAPE_RE.sub(sub, text)
+
+
+def tokenize(sql: str) -> List[Token]:
+    tokens: List[Token] = []
+    append = tokens.append
+    for m in _TOKEN_RE.finditer(sql.rstrip()):
+        kind = m.lastgroup
+        if kind == "tag":
+            kind = "string"
+        if kind == "comment":
+            continue
+        text = m.group(kind)
+        start, end = m.span(kind)
+        if kind == "word":
+            append(Token("word", text.lower(), start, end))
+        elif kind == "qident":
+            if text[0] != '"':
+                text = _unicode_escapes(text[2:])
+            append(Token("qident", text[1:-1].replace('""', '"'), start, end))
+        elif kind == "op" and text in ("'", '"'):
+            raise PolicyTokenizeError("Unterminated quoted literal.")
+        else:
+            append(Token(kind, text, start, end))
+    return tokens
+
+
+def _is_word(tok: Optional[Token], *values: str) -> bool:
+    return tok is not None and tok.kind == "word" and (not values or tok.value in values)
+
+
+def _skip_parens(tokens: List[Token], i: int) -> int:
+    '''
+    tokens[i] is "(": index just past the matching ")".
+    '''
+    depth = 0
+    while i < len(tokens):
+        t = tokens[i]
+        if t.kind == "punct" and t.value == "(":
+            depth += 1
+        elif t.kind == "punct" and t.value == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _main_verb(tokens: List[Token]) -> Optional[Token]:
+    '''
+    First token of the statement proper, skipping a leading WITH [RECURSIVE] cte list
+    and wrapping parentheses.
+    '''
+    i = 0
+    while i < len(tokens) and tokens[i].kind == "punct" and tokens[i].value == "(":
+        i += 1
+    if not _is_word(tokens[i] if i < len(tokens) else None, "with"):
+        return tokens[i] if i < len(tokens) else None
+
+    i += 1
+    if _is_word(tokens[i] if i < len(tokens) else None, "recursive"):
+        i += 1
+    while i < len(tokens):
+        i += 1  # cte name
+        if i < len(tokens) and tokens[i].value == "(":
+            i = _skip_parens(tokens, i)  # column list
+        if not _is_word(tokens[i] if i < len(tokens) else None, "as"):
+            return None
+        i += 1
+        if _is_word(tokens[i] if i < len(tokens) else None, "not"):
+            i += 1
+        if _is_word(tokens[i] if i < len(tokens) else None, "materialized"):
+            i += 1
+        if i >= len(tokens) or tokens[i].value != "(":
+            return None
+        i = _skip_parens(tokens, i)
+        if i < len(tokens) and tokens[i].kind == "punct" and tokens[i].value == ",":
+            i += 1
+            continue
+        break
+    while i < len(tokens) and tokens[i].kind == "punct" and tokens[i].value == "(":
+        i += 1
+    return tokens[i] if i < len(tokens) else None
+
+
+def _forbidden(tokens: List[Token]) -> bool:
+    for i, tok in enumerate(tokens):
+        if tok.kind not in ("word", "qident"):
+            continue
+        prev = tokens[i - 1] if i else None
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+
+        # pg_sleep(1), "pg_sleep"(1) and pg_catalog."pg_sleep"(1) all call the same
+        # function; only the last part of a qualified name is the function itself
+        if nxt is not None and nxt.kind == "punct" and nxt.value == "(" and tok.value.lower() in FORBIDDEN_FUNCTIONS:
+            return True
+
+        if tok.kind != "word":
+            continue
+
+        if tok.value in FORBIDDEN_STATEMENTS:
+            at_start = prev is None or (prev.kind == "punct" and prev.value == ";")
+            in_subquery = False
+            if prev is not None and prev.kind == "punct" and prev.value == "(":
+                opener = tokens[i - 2] if i >= 2 else None
+                opens = opener is None or opener.kind in ("punct", "op") or _is_word(opener, *_SUBQUERY_OPENERS)
+                # a nested statement goes on with a table / keyword, an expression with ) , IS or an operator
+                in_subquery = opens and nxt is not None and (
+                    nxt.kind == "qident" or (nxt.kind == "word" and nxt.value not in _EXPRESSION_WORDS)
+                )
+            if at_start or in_subquery:
+                return True
+
+        # SELECT ... INTO creates a table
+        if tok.value == "into" and not (prev is not None and prev.value == "."):
+            return True
+
+        # U&"!0070g_sleep" UESCAPE '!' would hide the name from the check above
+        if tok.value == "uescape":
+            return True
+
+        # row locks: FOR UPDATE / FOR NO KEY UPDATE / FOR SHARE / FOR KEY SHARE
+        if tok.value == "for" and _is_word(nxt, "update", "share", "no", "key"):
+            return True
+    return False
+
+
+@lru_cache(maxsize=4096)
+def _check(sql: str, allow_multi_statement: bool) -> Tuple[bool, Optional[str]]:
+    try:
+        tokens = tokenize(sql)
+    except PolicyTokenizeError as e:
+        return False, str(e)
+
+    if not tokens:
+        return False, "Empty SQL."
+
+    verb = _main_verb(tokens)
+    if not _is_word(verb, "select"):
+        return False, "Only SELECT queries are allowed (SELECT / WITH ... SELECT)."
+
+    if _forbidden(tokens):
+        return False, "Forbidden operation detected (read-only queries only)."
+
+    if not allow_multi_statement:
+        body = tokens
+        while body and body[-1].kind == "punct" and body[-1].value == ";":
+            body = body[:-1]
+        if any(t.kind == "punct" and t.value == ";" for t in body):
+            return False, "Multiple statements are not allowed."
+    return True, None
+
+
+def validate_sql_policy(sql: str, allow_multi_statement: bool) -> Tuple[bool, Optional[str]]:
+    '''
+    Policy validation function
+    This runs before any DB call.
+
+    If it fails → returns a POLICY_VIOLATION error
+    The database is never touched.
+
+    Results are memoized per (sql, allow_multi_statement), so repair retries and
+    repeated questions only tokenize once.
+    '''
+    if not isinstance(sql, str) or not sql.strip():
+        return False, "Empty SQL."
+    return _check(sql, bool(allow_multi_statement))
+
+
+def policy_cache_info():
+    return _check.cache_info()
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import hashlib
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import asyncpg
+
+from src.database.sql_policy import PolicyTokenizeError, tokenize
+
+
+def normalize_sql(sql: str) -> str:
+    '''
+    Canonical text form of a statement, used as the cache key.
+
+    Built on the policy tokenizer, so quoting (E'\'' escapes, $$ bodies,
+    quoted identifiers) is understood the way PostgreSQL reads it:
+    - whitespace and comments between tokens become a single space
+    - everything but string literals and quoted identifiers is lowercased
+      (safe in PostgreSQL because unquoted identifiers fold to lowercase)
+    - trailing semicolons are dropped
+
+    SQL the tokenizer rejects (an unterminated literal) is only stripped.
+    '''
+    sql = (sql or "").strip().rstrip(";").strip()
+    try:
+        tokens = tokenize(sql)
+    except PolicyTokenizeError:
+        return sql
+
+    out = []
+    prev_end = None
+    for tok in tokens:
+        if prev_end is not None and tok.start > prev_end:
+            out.append(" ")
+        text = sql[tok.start:tok.end]
+        out.append(text if tok.kind in ("string", "qident") else text.lower())
+        prev_end = tok.end
+    return "".join(out)
+
+
+def sql_fingerprint(sql: str) -> str:
+    return hashlib.sha1(normalize_sql(sql).encode("utf-8")).hexdigest()
+
+
+class ConnectionStatements:
+    '''
+    Prepared statements of one connection, carried by the connection itself
+    (a prepared statement is only valid on the connection that created it).
+    '''
+
+    def __init__(self) -> None:
+        self.generation = 0
+        self.statements: "OrderedDict[str, Any]" = OrderedDict()
+
+
+class StatementCachingConnection(asyncpg.Connection):
+    '''
+    asyncpg connection with room for PreparedStatementCache entries; pass it as
+    create_pool(connection_class=...). Pool proxies forward attribute access,
+    so acquired connections expose it as conn.prepared_statements.
+    '''
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = ConnectionStatements()
+
+
+class PreparedStatementCache:
+    '''
+    Per-connection LRU of prepared statements keyed by sql_fingerprint.
+
+    asyncpg's own statement cache only serves conn.fetch() & co. and does not
+    hand out the statement (whose RowDescription gives column_meta), and
+    conn.prepare() bypasses it. This cache keeps those explicitly prepared
+    statements in the connection's prepared_statements, bounded to max_size.
+    Connections without one (not created with StatementCachingConnection)
+    prepare every time.
+
+    invalidate() bumps a generation counter; stale per-connection entries are
+    dropped lazily the next time that connection is used.
+    '''
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._generation = 0
+        self._seen: "weakref.WeakSet[ConnectionStatements]" = weakref.WeakSet()
+
+    def _entry(self, conn: Any) -> Optional[ConnectionStatements]:
+        entry = getattr(conn, "prepared_statements", None)
+        if entry is None:
+            return None
+        if entry.generation != self._generation:
+            entry.statements.clear()
+            entry.generation = self._generation
+        self._seen.add(entry)
+        return entry
+
+    async def prepare(self, conn: Any, sql: str) -> Any:
+        entry = self._entry(conn) if self.max_size > 0 else None
+        if entry is None:
+            self.misses += 1
+            return await conn.prepare(sql)
+
+        key = sql_fingerprint(sql)
+        stmt = entry.statements.get(key)
+        if stmt is not None:
+            entry.statements.move_to_end(key)
+            self.hits += 1
+            return stmt
+
+        self.misses += 1
+        stmt = await conn.prepare(sql)
+        entry.statements[key] = stmt
+        while len(entry.statements) > self.max_size:
+            entry.statements.popitem(last=False)
+            self.evictions += 1
+        return stmt
+
+    def discard(self, conn: Any, sql: str) -> None:
+        entry = getattr(conn, "prepared_statements", None)
+        if entry is not None:
+            entry.statements.pop(sql_fingerprint(sql), None)
+
+    def invalidate(self) -> None:
+        '''
+        Call after DDL / schema reloads. Every cached statement is dropped.
+        '''
+        self._generation += 1
+        self.invalidations += 1
+        for entry in list(self._seen):
+            entry.statements.clear()
+        self._seen = weakref.WeakSet()
+
+    def stats(self) -> Dict[str, int]:
+        entries = list(self._seen)
+        return {
+            "size": sum(len(e.statements) for e in entries),
+            "connections": len(entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# Errors asyncpg raises when a cached statement no longer matches the schema
+# (e.g. "cached plan must not change result type" after ALTER TABLE).
+STALE_STATEMENT_ERRORS = (
+    asyncpg.exceptions.InvalidCachedStatementError,
+    asyncpg.exceptions.OutdatedSchemaCacheError,
+)
+
+
+async def _run_statement(cache: PreparedStatementCache, conn: Any, sql: str, method: str, *args: Any) -> Tuple[Any, Any]:
+    stmt = await cache.prepare(conn, sql)
+    try:
+        return stmt, await getattr(stmt, method)(*args)
+    except STALE_STATEMENT_ERRORS:
+        cache.discard(conn, sql)
+        cache.invalidations += 1
+        if conn.is_in_transaction():
+            # the error aborted the transaction: nothing else runs in it until ROLLBACK
+            raise
+        stmt = await cache.prepare(conn, sql)
+        return stmt, await getattr(stmt, method)(*args)
+
+
+async def fetch_with_statement(cache: PreparedStatementCache, conn: Any, sql: str, *args: Any) -> Tuple[Any, Any]:
+    '''
+    Prepare (or reuse) `sql` on `conn` and fetch all rows; returns (statement, rows).
+    A stale statement is discarded and, outside a transaction, re-prepared once.
+    '''
+    return await _run_statement(cache, conn, sql, "fetch", *args)
+
+
+async def fetchrow_with_statement(cache: PreparedStatementCache, conn: Any, sql: str, *args: Any) -> Tuple[Any, Any]:
+    '''
+    fetch_with_statement for statements known to return at most one row:
+    returns (statement, record or None) without building a result list.
+    '''
+    return await _run_statement(cache, conn, sql, "fetchrow", *args)
+
+
+async def fetch_prepared(cache: PreparedStatementCache, conn: Any, sql: str, *args: Any) -> Any:
+    _, rows = await fetch_with_statement(cache, conn, sql, *args)
+    return rows
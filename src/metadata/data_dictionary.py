@@ -314,4 +314,37 @@ You have the following data dictionary:
 
 If user refers to a synonym, map to the real column name.
 Always generate SQL using actual column names.
-"""
\ No newline at end of file
+"""
+
+
+# (table, column, referenced table, referenced column): the join keys behind
+# the ER diagram in NLQ_TO_SQL_PROMPT
+FOREIGN_KEYS = [
+    ("orders", "CustomerID", "customers", "CustomerID"),
+    ("orders", "EmployeeID", "employees", "EmployeeID"),
+    ("orders", "ShipVia", "shippers", "ShipperID"),
+    ("order_details", "OrderID", "orders", "OrderID"),
+    ("order_details", "ProductID", "products", "ProductID"),
+    ("products", "CategoryID", "categories", "CategoryID"),
+    ("products", "SupplierID", "suppliers", "SupplierID"),
+    ("employees", "ReportsTo", "employees", "EmployeeID"),
+    ("employee_territories", "EmployeeID", "employees", "EmployeeID"),
+    ("employee_territories", "TerritoryID", "territories", "TerritoryID"),
+    ("territories", "RegionID", "regions", "RegionID"),
+]
+
+
+def format_dict_prompt(tables) -> str:
+    """
+    DICT_PROMPT with only the given tables' entries.
+    """
+    wanted = set(tables)
+    sliced = {"tables": {t: info for t, info in DATA_DICTIONARY["tables"].items() if t in wanted}}
+    return f"""
+You have the following data dictionary:
+
+{sliced}
+
+If user refers to a synonym, map to the real column name.
+Always generate SQL using actual column names.
+"""
@@ -7,8 +7,6 @@ import pandas as pd
 import sqlparse
 import re
 from pathlib import Path
-from decimal import Decimal
-from datetime import datetime, date
 from dotenv import load_dotenv
 from difflib import SequenceMatcher
 from typing import Dict, Any, List
@@ -21,23 +19,17 @@ sys.path.append(str(PROJECT_ROOT))
 
 from src.app_graph.workflow import build_querymate_workflow
 from src.database.db_tool import SupabaseDBToolAsync, DBToolConfig
+from src.database.serialization import to_jsonable
+from src.database.local_backend import LOCAL_NORTHWIND_URL
+from src.config import DATABASE_URL
+from src.agent.llm_cache import install_llm_cache
 
 load_dotenv(PROJECT_ROOT / '.env')
 
 
 def clean_data(data):
-    """Recursively clean data for JSON serialization and comparison."""
-    if isinstance(data, list):
-        return [clean_data(i) for i in data]
-    elif isinstance(data, dict):
-        return {k: clean_data(v) for k, v in data.items()}
-    elif isinstance(data, Decimal):
-        return float(data)
-    elif isinstance(data, (datetime, date)):
-        return data.isoformat()
-    elif data is None:
-        return None
-    return data
+    """Clean data for JSON serialization and comparison (Decimal -> float, dates -> ISO strings)."""
+    return to_jsonable(data)
 
 
 def normalize_sql(sql: str) -> str:
@@ -238,7 +230,8 @@ async def run_golden_set_eval():
         data = json.load(f)
         test_cases = data['evaluations']
 
-    db_tool = SupabaseDBToolAsync(DBToolConfig(database_url=os.getenv("SUPABASE_DB_URL")))
+    llm_cache = install_llm_cache()
+    db_tool = SupabaseDBToolAsync(DBToolConfig(database_url=DATABASE_URL or LOCAL_NORTHWIND_URL))
     await db_tool.start()
     app = build_querymate_workflow(db_tool)
     
@@ -255,6 +248,8 @@ async def run_golden_set_eval():
         json.dump(results, f, indent=2, ensure_ascii=False)
     
     generate_detailed_report(results)
+    if llm_cache is not None:
+        print("LLM cache:", llm_cache.stats())
     await db_tool.close()
 
 if __name__ == "__main__":
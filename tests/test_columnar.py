@@ -0,0 +1,27 @@
+"""
+Columnar result payloads keep every column, even when result column names repeat.
+"""
+
+from src.database.columnar import columnar_to_rows, records_to_columnar
+
+
+def test_duplicate_column_names_keep_every_column():
+    records = [(1, 10, 3, 4), (2, 20, 5, 6)]
+    data = records_to_columnar(records, ["id", "id", "count", "count"])
+
+    assert data["columns"] == ["id", "id_1", "count", "count_1"]
+    assert data["values"] == {"id": [1, 2], "id_1": [10, 20], "count": [3, 5], "count_1": [4, 6]}
+    assert columnar_to_rows(data)[1] == {"id": 2, "id_1": 20, "count": 5, "count_1": 6}
+
+
+def test_suffix_does_not_collide_with_an_existing_column():
+    data = records_to_columnar([(1, 2, 3)], ["id", "id_1", "id"])
+
+    assert data["columns"] == ["id", "id_1", "id_2"]
+    assert data["values"] == {"id": [1], "id_1": [2], "id_2": [3]}
+
+
+def test_unique_names_are_unchanged():
+    data = records_to_columnar([], ["a", "b"])
+
+    assert data == {"format": "columnar", "columns": ["a", "b"], "values": {"a": [], "b": []}, "row_count": 0}
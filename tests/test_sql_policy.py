@@ -0,0 +1,45 @@
+"""
+Policy checks for forbidden function calls, in every spelling PostgreSQL resolves to the same function.
+"""
+
+import pytest
+
+from src.database.sql_policy import validate_sql_policy
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT pg_sleep(30)",
+    'SELECT "pg_sleep"(30)',
+    'SELECT "PG_SLEEP"(30)',
+    "SELECT pg_catalog.pg_sleep(30)",
+    'SELECT pg_catalog."pg_sleep"(30)',
+    'SELECT "pg_catalog"."pg_sleep" (30)',
+    'SELECT U&"\\0070g_sleep"(30)',
+    "SELECT U&\"!0070g_sleep\" UESCAPE '!' (30)",
+    'SELECT "pg_terminate_backend"(pid) FROM pg_stat_activity',
+    """SELECT "set_config"('statement_timeout', '0', false)""",
+    """SELECT "dblink_exec"('dbname=x', 'DROP TABLE orders')""",
+    "SELECT query_to_xml('DELETE FROM orders RETURNING *', true, false, '')",
+    """SELECT pg_catalog."query_to_xml_and_xmlschema"('SELECT 1', true, false, '')""",
+    "SELECT cursor_to_xml('c', 10, true, false, '')",
+    "SELECT table_to_xml('orders', true, false, '')",
+    "SELECT * FROM orders WHERE \"OrderID\" IN (SELECT pg_sleep(1))",
+])
+def test_forbidden_function_calls_are_rejected(sql):
+    ok, reason = validate_sql_policy(sql, allow_multi_statement=False)
+    assert not ok
+    assert reason == "Forbidden operation detected (read-only queries only)."
+
+
+@pytest.mark.parametrize("sql", [
+    'SELECT "pg_sleep" FROM t',  # a column of that name, not a call
+    "SELECT 'pg_sleep(30)' AS note",
+    'SELECT o."OrderID", o."ShipCountry" FROM orders o WHERE o."Freight" > (SELECT avg("Freight") FROM orders)',
+    'SELECT count(*) FROM "orders"',
+    "SELECT a FROM t WHERE (comment IS NULL)",  # statement verbs used as column names
+    "SELECT a, (comment) FROM t",
+    "SELECT a FROM t ORDER BY (analyze)",
+    "SELECT (set) FROM t",
+])
+def test_plain_selects_pass(sql):
+    assert validate_sql_policy(sql, allow_multi_statement=False) == (True, None)
@@ -0,0 +1,23 @@
+"""
+normalize_sql is the key of the prepared-statement and result caches: only
+differences PostgreSQL ignores may map to the same text.
+"""
+
+import pytest
+
+from src.database.statement_cache import normalize_sql, sql_fingerprint
+
+
+def test_case_and_whitespace_outside_literals_are_ignored():
+    assert normalize_sql("SELECT  a\n FROM   T WHERE b = 'X';") == "select a from t where b = 'X'"
+    assert sql_fingerprint("select a from t") == sql_fingerprint("SELECT A\nFROM t -- note\n;")
+
+
+@pytest.mark.parametrize("a, b", [
+    (r"SELECT * FROM t WHERE c = E'it\'s ABC'", r"SELECT * FROM t WHERE c = E'it\'s abc'"),
+    ("SELECT * FROM t WHERE c = 'ABC'", "SELECT * FROM t WHERE c = 'abc'"),
+    ('SELECT "Name" FROM t', 'SELECT "name" FROM t'),
+    ("SELECT $$ABC$$", "SELECT $$abc$$"),
+])
+def test_case_inside_literals_is_kept(a, b):
+    assert sql_fingerprint(a) != sql_fingerprint(b)